@@ -0,0 +1,141 @@
+import asyncio
+
+
+class AsyncIntentClassifier:
+    """Asyncio front-end that merges concurrent classify requests into batches"""
+
+    def __init__(self, classifier, max_batch_size=32, max_wait_ms=5.0, executor=None):
+        """
+        Initialize the asynchronous front-end
+
+        Args:
+            classifier (IntentClassifier): The classifier running the batched encode and scoring
+            max_batch_size (int): Maximum number of requests merged into one batch
+            max_wait_ms (float): Maximum time the first request of a batch waits for others
+            executor (concurrent.futures.Executor): Executor running the batches, None uses the loop default
+        """
+        if max_batch_size < 1:
+            raise ValueError("Maximum batch size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("Maximum wait time must be positive")
+
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.executor = executor
+        self._queue = None
+        self._worker = None
+        # Requests taken off the queue and not answered yet, failed by close()
+        self._batch = []
+
+    async def start(self):
+        """Start the batching worker on the running event loop"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the batching worker and fail requests that were not processed"""
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+
+        pending = self._batch
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Classifier was closed"))
+        self._batch = []
+        self._worker = None
+        self._queue = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def aclassify(self, text):
+        """
+        Classify input text, batched with other concurrent requests
+
+        Args:
+            text (str): The input sentence to classify
+
+        Returns:
+            tuple[str, float]: Predicted intent or 'other', and its confidence score
+        """
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def aclassify_batch(self, texts):
+        """
+        Classify several input texts concurrently
+
+        Args:
+            texts (list): The input sentences to classify
+
+        Returns:
+            list[tuple[str, float]]: Predicted intent or 'other' and its confidence score, in input order
+        """
+        return list(await asyncio.gather(*(self.aclassify(text) for text in texts)))
+
+    async def _collect_batch(self):
+        """Wait for a first request, then gather more until the batch is full or the deadline passes"""
+        loop = asyncio.get_running_loop()
+        # Collected in place so that close() sees the requests already taken off the queue
+        batch = self._batch = []
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Batching loop: one batched encode and scoring pass per collected batch"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+
+            # Requests whose caller gave up are dropped from the batch
+            batch = self._batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            # A cancellation by close() propagates, close() then fails the batch
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.classifier.classify_batch, texts, self.max_batch_size
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,152 @@
+import argparse
+from collections import deque
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from intent_classifier import IntentClassifier
+
+
+# Classifier owned by each worker process, created once by _init_worker
+_worker_classifier = None
+
+
+def _init_worker(options, state, threads_per_worker):
+    """Load the model once per worker process and install the shipped categories"""
+    global _worker_classifier
+
+    # Must be set before torch creates its thread pools
+    os.environ["OMP_NUM_THREADS"] = str(threads_per_worker)
+    os.environ["MKL_NUM_THREADS"] = str(threads_per_worker)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+    # Categories come from the parent process, so the templates are not encoded again
+    _worker_classifier = IntentClassifier(**options, demand_templates={}, warm_up=False)
+    _worker_classifier.load_state(state)
+
+
+def _classify_chunk(texts, batch_size):
+    """Classify one chunk of the corpus in a worker process"""
+    return _worker_classifier.classify_batch(texts, batch_size)
+
+
+class CorpusClassifier:
+    """Classify large corpora with a pool of worker processes, each holding one model"""
+
+    def __init__(self, classifier, workers=None, threads_per_worker=1, chunk_size=512, batch_size=32):
+        """
+        Initialize the corpus classifier
+
+        Args:
+            classifier (IntentClassifier): Classifier whose model, categories and thresholds are shipped to the workers
+            workers (int): Number of worker processes (default: CPU count // threads_per_worker)
+            threads_per_worker (int): Torch intra-op threads in each worker
+            chunk_size (int): Number of utterances sent to a worker at a time
+            batch_size (int): Number of sentences per encoder forward pass
+        """
+        if threads_per_worker < 1:
+            raise ValueError("Threads per worker must be at least 1")
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be at least 1")
+
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.threads_per_worker = threads_per_worker
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.options = {
+            "model_name": classifier.model_name,
+            "backend": classifier.backend,
+            "export_dir": classifier.export_dir,
+            "quantize": classifier.quantize,
+            "precision": classifier.precision,
+            "scoring": classifier.scoring,
+            "knn_k": classifier.knn_k,
+            "knn_aggregation": classifier.knn_aggregation,
+            "index": classifier.index,
+            "index_nlist": classifier.index_nlist,
+            "index_nprobe": classifier.index_nprobe,
+            "lexical_cascade": classifier.lexical_cascade,
+            "lexical_margin": classifier.lexical_margin,
+            "lexical_features": classifier.lexical_features,
+            "max_seq_length": classifier.max_seq_length,
+            "length_bucketing": classifier.length_bucketing
+        }
+        self.state = classifier.export_state()
+
+    def classify(self, texts):
+        """
+        Classify an iterable of utterances across the worker pool
+
+        Only a bounded number of chunks is in flight at any time, so the input
+        can be a generator over a corpus that does not fit in memory.
+
+        Args:
+            texts (iterable): Input sentences
+
+        Yields:
+            tuple[str, float]: Predicted intent or 'other' and its confidence score, in input order
+        """
+        # Spawned workers do not inherit torch thread pools from the parent
+        context = multiprocessing.get_context("spawn")
+        iterator = iter(texts)
+        pending = deque()
+        max_pending = self.workers * 2
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.options, self.state, self.threads_per_worker)
+        ) as executor:
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(itertools.islice(iterator, self.chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_classify_chunk, chunk, self.batch_size))
+
+                if not pending:
+                    break
+                yield from pending.popleft().result()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Classify a corpus of utterances (one per line) with worker processes")
+    parser.add_argument("input", help="Text file with one utterance per line")
+    parser.add_argument("output", help="JSONL file receiving one result per input line")
+    parser.add_argument("--model", default="all-MiniLM-L12-v2", help="SentenceTransformer model to use")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="Torch threads in each worker")
+    parser.add_argument("--chunk-size", type=int, default=512, help="Utterances sent to a worker at a time")
+    parser.add_argument("--batch-size", type=int, default=32, help="Sentences per encoder forward pass")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    classifier = IntentClassifier(model_name=args.model)
+    corpus_classifier = CorpusClassifier(
+        classifier,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size
+    )
+    classifier.cleanup()
+
+    print(f"🚀 Classifying with {corpus_classifier.workers} workers x {corpus_classifier.threads_per_worker} threads")
+    start = time.perf_counter()
+    count = 0
+    with open(args.input, encoding="utf-8") as fin, open(args.output, "w", encoding="utf-8") as fout:
+        texts = (line.rstrip("\n") for line in fin)
+        for intent, confidence in corpus_classifier.classify(texts):
+            fout.write(json.dumps({"intent": intent, "confidence": confidence}) + "\n")
+            count += 1
+    elapsed = time.perf_counter() - start
+    print(f"✅ {count} utterances in {elapsed:.1f} s ({count / elapsed if elapsed > 0 else 0.0:.1f} utterances/s)")
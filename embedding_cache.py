@@ -0,0 +1,201 @@
+from collections import OrderedDict, namedtuple
+import hashlib
+import os
+import re
+import string
+import tempfile
+import threading
+
+import numpy as np
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize", "nbytes", "max_bytes"])
+
+_PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}’‘“”¿¡…]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normalize an utterance so that trivial variants share one cache entry
+    Case, punctuation and repeated whitespace are ignored
+
+    Args:
+        text (str): The raw input text
+
+    Returns:
+        str: The normalized cache key
+    """
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class EmbeddingCache:
+    """Bounded LRU cache mapping normalized utterances to their embeddings"""
+
+    def __init__(self, maxsize=1024, max_bytes=None):
+        """
+        Initialize the cache
+
+        Args:
+            maxsize (int): Maximum number of cached utterances
+            max_bytes (int): Optional limit on the memory used by cached embeddings
+        """
+        if maxsize <= 0:
+            raise ValueError("Cache size must be positive")
+
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.model_key = None
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def bind(self, model_key):
+        """
+        Associate the cache with a model, clearing it if the model changed
+
+        Args:
+            model_key (str): Identifier of the model producing the embeddings
+        """
+        with self._lock:
+            if model_key != self.model_key:
+                self._clear()
+                self.model_key = model_key
+
+    def get(self, key, model_key=None):
+        """
+        Look up a normalized utterance and mark it as recently used
+
+        Args:
+            key (str): Normalized text, see normalize_text()
+            model_key (str): Model the caller needs the embedding of, a miss if the cache
+                is bound to another one
+
+        Returns:
+            np.ndarray: The cached embedding, or None on a miss
+        """
+        with self._lock:
+            embedding = self._entries.get(key) if model_key in (None, self.model_key) else None
+            if embedding is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return embedding
+
+    def put(self, key, embedding, model_key=None):
+        """
+        Store an embedding, evicting the least recently used entries if needed
+
+        Args:
+            key (str): Normalized text, see normalize_text()
+            embedding (np.ndarray): Embedding of the utterance
+            model_key (str): Model the embedding was computed with, not stored if the cache
+                is bound to another one
+        """
+        embedding = embedding.copy()
+        embedding.flags.writeable = False
+        size = embedding.nbytes
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            # Computed before the cache was rebound
+            if model_key is not None and model_key != self.model_key:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous.nbytes
+            self._entries[key] = embedding
+            self._nbytes += size
+
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes is not None and self._nbytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+    def clear(self):
+        """Remove every entry and reset the statistics"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+
+    def cache_info(self):
+        """Return hit/miss counters and current size, like functools.lru_cache"""
+        with self._lock:
+            return CacheInfo(
+                self._hits, self._misses, self.maxsize, len(self._entries), self._nbytes, self.max_bytes
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TemplateEmbeddingStore:
+    """Persistent on-disk cache of template phrase embeddings"""
+
+    def __init__(self, cache_dir):
+        """
+        Initialize the store
+
+        Args:
+            cache_dir (str): Directory holding one .npy file per model and phrase list
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+
+    def _path(self, model_key, phrases):
+        """Return the file path for a model and a list of phrases"""
+        digest = hashlib.sha256("\x00".join(phrases).encode("utf-8")).hexdigest()
+        model_dir = re.sub(r"[^A-Za-z0-9._-]+", "_", model_key)
+        return os.path.join(self.cache_dir, model_dir, f"{digest}.npy")
+
+    def load(self, model_key, phrases):
+        """
+        Load the embeddings of a phrase list, memory-mapped read-only
+
+        Args:
+            model_key (str): Identifier of the model that produced the embeddings
+            phrases (list): Template phrases, in order
+
+        Returns:
+            np.ndarray: Embeddings of shape [num_phrases, dim], or None if not cached
+        """
+        path = self._path(model_key, phrases)
+        try:
+            embeddings = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(phrases):
+            return None
+        return embeddings
+
+    def save(self, model_key, phrases, embeddings):
+        """
+        Store the embeddings of a phrase list
+        The file is written atomically so concurrent workers never read a partial file
+
+        Args:
+            model_key (str): Identifier of the model that produced the embeddings
+            phrases (list): Template phrases, in order
+            embeddings (np.ndarray): Embeddings of shape [num_phrases, dim]
+        """
+        path = self._path(model_key, phrases)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
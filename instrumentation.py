@@ -0,0 +1,155 @@
+import bisect
+import threading
+
+
+STAGES = ("lexical", "tokenize", "forward", "similarity", "decision")
+COUNTERS = ("calls", "inputs", "other", "lexical_hits", "errors")
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Stages such as similarity and decision take microseconds
+STAGE_BUCKETS_MS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5) + LATENCY_BUCKETS_MS
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets):
+        """
+        Args:
+            buckets (tuple): Increasing bucket upper bounds, an overflow bucket is added
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one value"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def quantile(self, q, counts=None, count=None):
+        """Estimate a quantile as the upper bound of the bucket containing it"""
+        counts = self._counts if counts is None else counts
+        count = self._count if count is None else count
+        if count == 0:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound if bound != float("inf") else self._max
+        return self._max
+
+    def snapshot(self):
+        """Return counts and summary statistics as a JSON-serializable dict"""
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self._count, self._sum, self._max
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": count,
+            "mean": total / count if count else 0.0,
+            "max": maximum,
+            "p50": self.quantile(0.5, counts, count),
+            "p90": self.quantile(0.9, counts, count),
+            "p99": self.quantile(0.99, counts, count),
+            "buckets": dict(zip(labels, counts))
+        }
+
+
+class Instrumentation:
+    """
+    Opt-in per-stage timers, counters and latency histograms for the classification hot path
+
+    Pass an instance to IntentClassifier(instrumentation=...). Every classification
+    call records its stage timings and counts, then hands a per-call event to the
+    exporter, e.g. to forward it to a metrics backend or a log. A classifier
+    created without instrumentation only pays a None check per call.
+    """
+
+    def __init__(self, exporter=None):
+        """
+        Args:
+            exporter (callable): Called with one event dict per classification call, see record_call()
+        """
+        self.exporter = exporter
+        self.stages = {stage: Histogram(STAGE_BUCKETS_MS) for stage in STAGES}
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def record_call(self, results, timings, elapsed_ms):
+        """
+        Record one classification call and export its event
+
+        Args:
+            results (list): ClassificationResult of each input
+            timings (dict): Milliseconds spent in each stage during the call
+            elapsed_ms (float): End-to-end duration of the call
+
+        Returns:
+            dict: The exported event
+        """
+        other = sum(result.predicted_intent == "other" for result in results)
+        lexical_hits = sum(result.stage == "lexical" for result in results)
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["inputs"] += len(results)
+            self._counters["other"] += other
+            self._counters["lexical_hits"] += lexical_hits
+        for stage, milliseconds in timings.items():
+            self.stages[stage].observe(milliseconds)
+        self.latency.observe(elapsed_ms)
+
+        event = {
+            "inputs": len(results),
+            "other": other,
+            "lexical_hits": lexical_hits,
+            "latency_ms": elapsed_ms,
+            "stages_ms": dict(timings)
+        }
+        self._export(event)
+        return event
+
+    def record_error(self, error, timings, elapsed_ms):
+        """
+        Record a failed classification call and export its event
+
+        Args:
+            error (Exception): The raised error
+            timings (dict): Milliseconds spent in each stage before the error
+            elapsed_ms (float): Duration of the call until the error
+        """
+        with self._lock:
+            self._counters["calls"] += 1
+            self._counters["errors"] += 1
+        self._export({"error": f"{type(error).__name__}: {error}", "latency_ms": elapsed_ms, "stages_ms": dict(timings)})
+
+    def _export(self, event):
+        if self.exporter is None:
+            return
+        try:
+            self.exporter(event)
+        except Exception as e:
+            # A failing exporter must not break classification
+            print(f"⚠️ Instrumentation exporter failed: {e}")
+
+    def counters(self):
+        """Return a copy of the counters"""
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self):
+        """Return counters, end-to-end latency and per-stage histograms as a JSON-serializable dict"""
+        return {
+            "counters": self.counters(),
+            "latency_ms": self.latency.snapshot(),
+            "stages_ms": {stage: histogram.snapshot() for stage, histogram in self.stages.items()}
+        }
@@ -1,25 +1,611 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
+from collections import deque, namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import contextlib
+from functools import cached_property
+import glob
+import os
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+import warnings
+import weakref
+from types import MappingProxyType
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, TemplateEmbeddingStore, normalize_text
+from lexical_cascade import CascadeStats, LexicalCascade
+from model_registry import model_nbytes, registry
+from projection import EmbeddingProjection
+from vector_index import INDEX_TYPES, make_index, top_k
+
+
+BACKENDS = ("torch", "onnx")
+SCORING_MODES = ("centroid", "knn")
+KNN_AGGREGATIONS = ("max", "vote")
+# 'fp16' stores category and template embeddings in float16, 'bf16' also runs the encoder in bfloat16
+PRECISIONS = ("fp32", "fp16", "bf16")
+DEFAULT_EXPORT_DIR = os.path.join("~", ".cache", "intent_classifier", "onnx")
+# Categories kept in the score breakdown of a result when an ANN index is used
+INDEX_CANDIDATES = 5
+# Rows of a float16 matrix upcast at once when scoring, 768 KB of float32 at 384 dimensions
+SCORING_BLOCK_ROWS = 512
+# Scoring matrices up to this many rows stay in float32 whatever the precision: upcasting them costs
+# more than the product itself, and they take at most 1.5 MB more at 384 dimensions
+FLOAT32_SCORING_ROWS = 2048
+
+MemoryInfo = namedtuple("MemoryInfo", ["encoder_bytes", "embedding_bytes", "cache_bytes", "precision"])
+PaddingInfo = namedtuple("PaddingInfo", ["batches", "tokens", "padded_tokens", "waste", "recent_waste"])
+
+
+def cpu_supports_bf16():
+    """
+    Check whether the CPU has native bfloat16 instructions (AVX512-BF16, AMX or Arm BF16)
+    Without them PyTorch emulates bfloat16 and runs slower than float32.
+    
+    Returns:
+        bool: True when bfloat16 matrix products are accelerated
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            return re.search(r"\b(avx512_bf16|amx_bf16|bf16)\b", f.read()) is not None
+    except OSError:
+        pass
+    if platform.system() == "Darwin":
+        try:
+            output = subprocess.run(
+                ["sysctl", "-n", "hw.optional.arm.FEAT_BF16"], capture_output=True, text=True, check=True
+            ).stdout
+            return output.strip() == "1"
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    return False
+
+
+def load_sentence_model(model_name, backend="torch", export_dir=None, quantize=False, precision="fp32"):
+    """
+    Load a SentenceTransformer encoder with the requested inference backend
+    
+    The ONNX backend exports the model once and keeps the export on disk, so later
+    loads go straight to ONNX Runtime. Tokenization, pooling and normalization are
+    the same SentenceTransformer modules as with the torch backend.
+    
+    Args:
+        model_name (str): Name of the SentenceTransformer model to load
+        backend (str): 'torch' for eager PyTorch or 'onnx' for ONNX Runtime on CPU
+        export_dir (str): Directory holding ONNX exports (default: ~/.cache/intent_classifier/onnx)
+        quantize (bool): Use int8 dynamically quantized linear layers
+        precision (str): 'bf16' runs the torch encoder in bfloat16 when the hardware supports it,
+            'fp32' and 'fp16' load it in float32
+    
+    Returns:
+        SentenceTransformer: The loaded encoder
+    """
+    # Imported here so that importing this module stays fast
+    from sentence_transformers import SentenceTransformer
+    
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+    if precision == "bf16" and (backend != "torch" or quantize):
+        raise ValueError("bf16 precision requires the torch backend without quantization")
+    
+    if backend == "torch":
+        model = SentenceTransformer(model_name, device="cpu" if quantize else None)
+        if quantize:
+            import torch
+            
+            # Weights are stored as int8, activations are quantized on the fly
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif precision == "bf16":
+            import torch
+            
+            if model.device.type == "cpu" and not cpu_supports_bf16():
+                print("⚠️ This CPU has no bfloat16 instructions, the encoder runs in float32")
+            else:
+                # Halves the weights, the matrix products run on bf16 units
+                model = model.to(torch.bfloat16)
+        return model
+    
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    export_path = os.path.join(
+        os.path.expanduser(export_dir or DEFAULT_EXPORT_DIR), re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+    )
+    exports = glob.glob(os.path.join(export_path, "**", "model.onnx"), recursive=True)
+    if exports:
+        # Name the file explicitly, quantized exports may sit next to it
+        file_name = os.path.relpath(exports[0], export_path)
+        model = SentenceTransformer(
+            export_path, backend="onnx", model_kwargs={**model_kwargs, "file_name": file_name}
+        )
+    else:
+        print(f"📦 Exporting {model_name} to ONNX (first run only)...")
+        model = SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+        model.save_pretrained(export_path)
+    
+    if not quantize:
+        return model
+    
+    # ONNX Runtime quantization presets are specific to the CPU instruction set
+    config = "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+    # The weight type (qint8 or quint8) in the file name depends on the preset
+    pattern = os.path.join(export_path, "**", f"model_*int8_{config}.onnx")
+    if not glob.glob(pattern, recursive=True):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        
+        print(f"📦 Quantizing ONNX export of {model_name} ({config}, first run only)...")
+        export_dynamic_quantized_onnx_model(model, config, export_path)
+    file_name = os.path.relpath(glob.glob(pattern, recursive=True)[0], export_path)
+    return SentenceTransformer(
+        export_path, backend="onnx", model_kwargs={**model_kwargs, "file_name": file_name}
+    )
+
+
+def token_lengths(model, texts):
+    """
+    Count the tokens of each text as the encoder sees them, special tokens and truncation included
+    
+    Args:
+        model (SentenceTransformer): The encoder
+        texts (list): Input sentences
+    
+    Returns:
+        np.ndarray: Number of tokens of each text
+    """
+    encoded = model.tokenizer(
+        list(texts), add_special_tokens=True, truncation=True, max_length=model.max_seq_length
+    )
+    return np.array([len(ids) for ids in encoded["input_ids"]])
+
+
+def padding_waste(lengths, batch_size):
+    """
+    Count the padding tokens added when consecutive texts are batched together
+    
+    Args:
+        lengths (np.ndarray): Number of tokens of each text, in batching order
+        batch_size (int): Number of texts per batch
+    
+    Returns:
+        tuple[int, int]: Real tokens and padding tokens
+    """
+    lengths = np.asarray(lengths)
+    padded = sum(
+        int(lengths[start:start + batch_size].max()) * len(lengths[start:start + batch_size])
+        for start in range(0, len(lengths), batch_size)
+    )
+    return int(lengths.sum()), padded - int(lengths.sum())
+
+
+def encode_length_bucketed(model, texts, batch_size=32, stats=None, timings=None, lock=None):
+    """
+    Encode texts in batches of similar token length and return the embeddings in input order
+    
+    A batch is padded to its longest text, so grouping texts of similar token length
+    removes most of the padding. SentenceTransformer.encode() sorts by character
+    count, which only approximates the token count that padding depends on.
+    
+    Args:
+        model (SentenceTransformer): The encoder
+        texts (list): Input sentences
+        batch_size (int): Number of sentences per encoder forward pass
+        stats (PaddingStats): Optional recorder of the padding of each batch
+        timings (dict): Optional stage durations in milliseconds, see encode_staged()
+        lock (threading.Lock): Held while tokenizing, see encode_staged()
+    
+    Returns:
+        np.ndarray: Embeddings of shape [num_texts, dim]
+    """
+    start = time.perf_counter()
+    with lock if lock is not None else contextlib.nullcontext():
+        lengths = token_lengths(model, texts)
+    order = np.argsort(lengths, kind="stable")
+    if timings is not None:
+        add_timing(timings, "tokenize", start)
+    
+    batches = []
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        batches.append(encode_staged(model, [texts[i] for i in batch], timings, lock))
+        if stats is not None:
+            stats.record(lengths[batch])
+    
+    embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=batches[0].dtype)
+    embeddings[order] = np.concatenate(batches)
+    return embeddings
+
+
+def encode_staged(model, texts, timings=None, lock=None):
+    """
+    Encode one batch like SentenceTransformer.encode(), running tokenization and the forward pass apart
+    
+    Only tokenization needs the lock: fast tokenizers are not safe to call from several
+    threads at once, while forward passes of several threads can overlap.
+    
+    Args:
+        model (SentenceTransformer): The encoder
+        texts (list): Input sentences, encoded as a single batch
+        timings (dict): Optional stage durations in milliseconds, incremented in place
+        lock (threading.Lock): Held while tokenizing, None when there is a single caller
+    
+    Returns:
+        np.ndarray: Embeddings of shape [num_texts, dim]
+    """
+    # Imported here so that importing this module stays fast
+    import torch
+    from sentence_transformers.util import batch_to_device
+    
+    start = time.perf_counter()
+    with lock if lock is not None else contextlib.nullcontext():
+        features = model.tokenize(texts)
+    features = batch_to_device(features, model.device)
+    if timings is not None:
+        add_timing(timings, "tokenize", start)
+    
+    start = time.perf_counter()
+    with torch.inference_mode():
+        embeddings = model.forward(features)["sentence_embedding"].float().cpu().numpy()
+    if timings is not None:
+        add_timing(timings, "forward", start)
+    return embeddings
+
+
+def add_timing(timings, stage, start):
+    """Add the milliseconds elapsed since start (a time.perf_counter() value) to a stage"""
+    timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - start) * 1000
+
+
+class PaddingStats:
+    """Thread-safe record of the tokens and padding of each encoder batch"""
+    
+    def __init__(self, recent=100):
+        """
+        Args:
+            recent (int): Number of most recent batches whose padding ratio is kept
+        """
+        self._batches = 0
+        self._tokens = 0
+        self._padded = 0
+        self._recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+    
+    def record(self, lengths):
+        """Record one batch from the token count of its texts"""
+        tokens = int(np.sum(lengths))
+        padded = int(np.max(lengths)) * len(lengths) - tokens
+        with self._lock:
+            self._batches += 1
+            self._tokens += tokens
+            self._padded += padded
+            self._recent.append(padded / (tokens + padded))
+    
+    def clear(self):
+        """Reset every counter"""
+        with self._lock:
+            self._batches = self._tokens = self._padded = 0
+            self._recent.clear()
+    
+    def info(self):
+        """Return the totals, the overall padding ratio and the ratio of each recent batch"""
+        with self._lock:
+            total = self._tokens + self._padded
+            return PaddingInfo(
+                self._batches, self._tokens, self._padded,
+                self._padded / total if total else 0.0, tuple(self._recent)
+            )
+
+
+class ClassificationResult:
+    """Outcome of scoring one input text against every intent category"""
+    
+    def __init__(self, input_text, predicted_intent, confidence, scores=None, category_names=(), stage="encoder"):
+        """
+        Args:
+            input_text (str): The analyzed text
+            predicted_intent (str): Predicted intent or 'other'
+            confidence (float): Confidence score of the prediction
+            scores (np.ndarray): Similarity with each category, aligned with category_names
+            category_names (tuple): Category names in matrix order
+            stage (str): 'encoder', or 'lexical' when answered by the lexical cascade, whose
+                confidence and scores are class probabilities
+        """
+        self.input_text = input_text
+        self.predicted_intent = predicted_intent
+        self.confidence = confidence
+        self.scores = scores
+        self.category_names = category_names
+        self.stage = stage
+    
+    @property
+    def all_scores(self):
+        """dict: Similarity with every category, sorted by descending score"""
+        if self.scores is None:
+            return {}
+        order = np.argsort(-self.scores, kind="stable")
+        return {self.category_names[i]: float(self.scores[i]) for i in order}
+    
+    def as_tuple(self):
+        """Return the (intent, confidence) pair returned by classify()"""
+        return self.predicted_intent, self.confidence
+
+
+class CategorySnapshot:
+    """
+    Immutable view of the categories, their embeddings and the decision thresholds
+    
+    Classifications read a single snapshot reference, so they never observe a
+    half-applied update. Changes build a new snapshot and publish it atomically.
+    """
+    
+    def __init__(self, templates, template_embeddings, margin_threshold, min_score,
+                 category_matrix=None, index=None, cascade=None, dtype=np.float32,
+                 projection=None, embedding_key=None):
+        """
+        Args:
+            templates (dict): Example phrases by category
+            template_embeddings (dict): Phrase embeddings by category, shape [num_phrases, dim]
+            margin_threshold (float): Minimum difference between the top two categories
+            min_score (float): Minimum similarity of the top category
+            category_matrix (np.ndarray): Precomputed stacked matrix, rebuilt when None
+            index (ExactIndex | IVFIndex | FaissIndex): Nearest-neighbor index over the normalized
+                category embeddings, None scores every category
+            cascade (LexicalCascade): Lexical first stage trained on these categories, None disables it
+            dtype (type): Storage type of the embeddings, np.float16 halves their memory. Scores
+                are still computed in float32.
+            projection (EmbeddingProjection): Projection the embeddings were reduced with, also
+                applied to the inputs scored against this snapshot
+            embedding_key (str): Identifier of the encoder and projection, keys the utterance cache
+        """
+        self.dtype = np.dtype(dtype)
+        self.templates = MappingProxyType({intent: tuple(phrases) for intent, phrases in templates.items()})
+        # No copy when the embeddings already have the storage type
+        self.template_embeddings = MappingProxyType({
+            intent: np.asarray(embeddings, dtype=self.dtype) for intent, embeddings in template_embeddings.items()
+        })
+        self.margin_threshold = margin_threshold
+        self.min_score = min_score
+        
+        # Stacked L2-normalized mean embeddings, row i belongs to category_names[i]
+        self.category_names = tuple(self.template_embeddings.keys())
+        if category_matrix is None and self.category_names:
+            category_matrix = np.stack([
+                _mean_direction(self.template_embeddings[intent]) for intent in self.category_names
+            ])
+            category_matrix = category_matrix.astype(scoring_dtype(len(category_matrix), self.dtype))
+            category_matrix.flags.writeable = False
+        self.category_matrix = category_matrix
+        self.index = index
+        self.cascade = cascade
+        self.projection = projection
+        self.embedding_key = embedding_key
+    
+    @property
+    def category_embeddings(self):
+        """Mapping: float32 mean embedding by category, computed on access rather than stored"""
+        return MappingProxyType({
+            intent: np.mean(embeddings, axis=0, dtype=np.float64).astype(np.float32)
+            for intent, embeddings in self.template_embeddings.items()
+        })
+    
+    @cached_property
+    def example_index(self):
+        """
+        tuple: Every template embedding in one contiguous L2-normalized matrix, grouped by
+        category in category_names order, with the first row of each category and the
+        category index of each row. Built on first use, only needed for k-NN scoring.
+        """
+        blocks = [np.asarray(self.template_embeddings[intent], dtype=np.float32) for intent in self.category_names]
+        counts = [len(block) for block in blocks]
+        matrix = _normalize_rows(np.concatenate(blocks))
+        matrix = matrix.astype(scoring_dtype(len(matrix), self.dtype), copy=False)
+        matrix.flags.writeable = False
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        labels = np.repeat(np.arange(len(blocks)), counts)
+        return matrix, offsets, labels
+    
+    def with_categories(self, templates, template_embeddings, rows=None, index=None):
+        """
+        Return a copy with new categories and the same thresholds
+        
+        Args:
+            templates (dict): Example phrases by category
+            template_embeddings (dict): Phrase embeddings by category
+            rows (dict): New category matrix rows (see _mean_direction) of the changed categories,
+                categories whose embeddings are unchanged reuse their row and the others are computed
+            index: Nearest-neighbor index over the new categories
+        """
+        names = list(template_embeddings)
+        if not names:
+            return CategorySnapshot(
+                templates, template_embeddings, self.margin_threshold, self.min_score, index=index,
+                dtype=self.dtype, projection=self.projection, embedding_key=self.embedding_key
+            )
+        
+        rows = dict(rows or {})
+        if self.category_matrix is not None:
+            for intent, row in zip(self.category_names, self.category_matrix):
+                if template_embeddings.get(intent) is self.template_embeddings[intent]:
+                    rows.setdefault(intent, row)
+        matrix = np.stack([
+            rows[intent] if intent in rows else _mean_direction(template_embeddings[intent]) for intent in names
+        ])
+        matrix = matrix.astype(scoring_dtype(len(matrix), self.dtype), copy=False)
+        matrix.flags.writeable = False
+        return CategorySnapshot(
+            templates, template_embeddings, self.margin_threshold, self.min_score, matrix, index,
+            dtype=self.dtype, projection=self.projection, embedding_key=self.embedding_key
+        )
+    
+    def with_thresholds(self, margin_threshold=None, min_score=None):
+        """Return a copy with new thresholds, sharing the category data"""
+        snapshot = CategorySnapshot(
+            self.templates, self.template_embeddings,
+            self.margin_threshold if margin_threshold is None else margin_threshold,
+            self.min_score if min_score is None else min_score,
+            self.category_matrix, self.index, self.cascade, self.dtype, self.projection, self.embedding_key
+        )
+        if "example_index" in self.__dict__:
+            snapshot.__dict__["example_index"] = self.__dict__["example_index"]
+        return snapshot
+    
+    def with_index(self, index):
+        """Return a copy using another nearest-neighbor index, sharing the category data"""
+        return CategorySnapshot(
+            self.templates, self.template_embeddings,
+            self.margin_threshold, self.min_score, self.category_matrix, index, self.cascade, self.dtype,
+            self.projection, self.embedding_key
+        )
+    
+    def with_cascade(self, cascade):
+        """Return a copy using another lexical cascade, sharing the category data"""
+        snapshot = CategorySnapshot(
+            self.templates, self.template_embeddings,
+            self.margin_threshold, self.min_score, self.category_matrix, self.index, cascade, self.dtype,
+            self.projection, self.embedding_key
+        )
+        if "example_index" in self.__dict__:
+            snapshot.__dict__["example_index"] = self.__dict__["example_index"]
+        return snapshot
+    
+    @property
+    def nbytes(self):
+        """int: Memory held by the template and category embeddings"""
+        arrays = list(self.template_embeddings.values())
+        if self.category_matrix is not None:
+            arrays.append(self.category_matrix)
+        if "example_index" in self.__dict__:
+            arrays.append(self.example_index[0])
+        return sum(np.asarray(array).nbytes for array in arrays)
 
 
 class IntentClassifier:
-    """Class to classify user intentions using SBERT embeddings"""
+    """
+    Class to classify user intentions using SBERT embeddings
+    
+    A single instance can be shared between threads: classifications read an
+    immutable CategorySnapshot without locking, and category or threshold
+    updates publish a new snapshot atomically.
+    """
     
-    def __init__(self, model_name='all-MiniLM-L12-v2', margin_threshold=0.1):
+    def __init__(self, model_name='all-MiniLM-L12-v2', margin_threshold=0.1, min_score=0.2,
+                 cache_size=0, cache_max_bytes=None, template_cache_dir=None,
+                 background_loading=False, warm_up=True, backend="torch", export_dir=None,
+                 quantize=False, demand_templates=None, scoring="centroid", knn_k=5,
+                 knn_aggregation="max", index="exact", index_nlist=None, index_nprobe=8,
+                 lexical_cascade=False, lexical_margin=0.5, lexical_features="tfidf",
+                 lexical_audit_rate=0.0, projection=None, projection_dim=None, projection_fit_texts=None,
+                 max_seq_length=None, length_bucketing=True, instrumentation=None, precision="fp32",
+                 model_registry=None):
         """
         Initialize the intent classifier
         
         Args:
             model_name (str): Name of the SentenceTransformer model to use
             margin_threshold (float): Minimum difference threshold between top two categories
+            min_score (float): Minimum similarity of the top category, below it the input is 'other'
+            cache_size (int): Number of utterance embeddings kept in an LRU cache (0 disables it)
+            cache_max_bytes (int): Optional memory limit for the utterance embedding cache
+            template_cache_dir (str): Optional directory where template embeddings are persisted
+            background_loading (bool): Load the model in a background thread and return immediately
+            warm_up (bool): Run a dummy forward pass after loading so the first request is not slowed down
+            backend (str): Encoder inference backend, 'torch' or 'onnx'
+            export_dir (str): Directory where ONNX exports are cached
+            quantize (bool): Run the encoder with int8 dynamically quantized linear layers
+            demand_templates (dict): Example phrases by category, replacing the built-in templates
+            scoring (str): 'centroid' scores the mean embedding of each category, 'knn' scores every example
+            knn_k (int): Number of nearest examples voting in k-NN mode with 'vote' aggregation
+            knn_aggregation (str): 'max' keeps the best example of each category, 'vote' sums
+                the similarities of the k nearest examples per category
+            index (str): Category search, 'exact' scores every category, 'ivf' (pure NumPy) and
+                'faiss' (requires faiss-cpu) only score the categories close to the input
+            index_nlist (int): Number of clusters of the 'ivf' and 'faiss' indexes (default: about
+                sqrt(num_categories), flat index for 'faiss')
+            index_nprobe (int): Number of clusters scanned per input
+            lexical_cascade (bool): Answer confident near-verbatim inputs with a character n-gram
+                model before the encoder, see train_lexical_cascade()
+            lexical_margin (float): Minimum probability gap between the two best categories for
+                the lexical stage to answer
+            lexical_features (str): Lexical features, 'tfidf' or 'hashing'
+            lexical_audit_rate (float): Fraction of lexical answers also classified by the encoder
+                to measure their agreement, see cascade_info()
+            projection (str): Reduce embeddings with 'pca' or 'truncate' (highest-variance coordinates)
+                before scoring and caching, None keeps the full width
+            projection_dim (int): Dimension of the projected embeddings, None uses 128 or, with PCA,
+                the number of fitted embeddings if smaller
+            projection_fit_texts (list): Extra utterances the projection is fitted on, together
+                with the templates. PCA needs at least projection_dim fitted embeddings.
+            max_seq_length (int): Truncate inputs to this many tokens, None keeps the model limit
+            length_bucketing (bool): Batch texts of similar token length together and record the
+                padding of each batch, see padding_info()
+            instrumentation (Instrumentation): Optional recorder of per-stage timings, counters
+                and latency histograms of every classification call
+            precision (str): 'fp32', 'fp16' stores category and template embeddings in float16,
+                'bf16' also runs the encoder in bfloat16 on CPUs with bf16 instructions (torch backend only)
+            model_registry (ModelRegistry): Registry the encoder is shared through, the process-wide
+                one by default. Classifiers with the same model_key share one encoder.
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode '{scoring}', expected one of {SCORING_MODES}")
+        if knn_aggregation not in KNN_AGGREGATIONS:
+            raise ValueError(f"Unknown k-NN aggregation '{knn_aggregation}', expected one of {KNN_AGGREGATIONS}")
+        if knn_k < 1:
+            raise ValueError("knn_k must be at least 1")
+        if index not in INDEX_TYPES:
+            raise ValueError(f"Unknown index '{index}', expected one of {INDEX_TYPES}")
+        if index != "exact" and scoring != "centroid":
+            raise ValueError("Nearest-neighbor indexes are only supported with centroid scoring")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+        if precision == "bf16" and (backend != "torch" or quantize):
+            raise ValueError("bf16 precision requires the torch backend without quantization")
+        
         self.model_name = model_name
-        self.margin_threshold = margin_threshold
+        self.backend = backend
+        self.export_dir = export_dir
+        self.quantize = quantize
+        self.precision = precision
+        self.scoring = scoring
+        self.knn_k = knn_k
+        self.knn_aggregation = knn_aggregation
+        self.index = index
+        self.index_nlist = index_nlist
+        self.index_nprobe = index_nprobe
+        # Empty copy-on-write index that every category index is derived from
+        self._empty_index = make_index(index, index_nlist, index_nprobe) if index != "exact" else None
+        self.lexical_cascade = lexical_cascade
+        self.lexical_margin = lexical_margin
+        self.lexical_features = lexical_features
+        self.lexical_audit_rate = lexical_audit_rate
+        self.cascade_stats = CascadeStats() if lexical_cascade else None
+        self._lexical_examples = {}
+        self.projection_fit_texts = list(projection_fit_texts or [])
+        self.max_seq_length = max_seq_length
+        self.length_bucketing = length_bucketing
+        self.padding_stats = PaddingStats() if length_bucketing else None
+        self.instrumentation = instrumentation
+        self.model_registry = registry if model_registry is None else model_registry
+        # Releases the shared encoder exactly once, on cleanup() or when the classifier is collected
+        self._release_model = None
         self.model = None
-        self.category_embeddings = {}
+        self.embedding_cache = EmbeddingCache(cache_size, cache_max_bytes) if cache_size else None
+        self.template_store = TemplateEmbeddingStore(template_cache_dir) if template_cache_dir else None
+        self.warm_up = warm_up
+        self._ready = Future()
+        
+        # Writers are serialized, readers only dereference self._snapshot
+        self._write_lock = threading.Lock()
+        # Fast tokenizers are not safe to call from several threads at once,
+        # replaced by the lock of the shared encoder once it is acquired
+        self._encode_lock = threading.Lock()
         
         # Demand templates by category
-        self.demand_templates = {
+        default_templates = {
             "read_text": [
                 "Can you read aloud what's written here?",
                 "Please read the text shown on the screen.",
@@ -54,31 +640,318 @@ class IntentClassifier:
             ]
         }
         
-        self._initialize_model()
+        if demand_templates is None:
+            demand_templates = default_templates
+        # Fitted on the templates when the model is initialized
+        self._snapshot = CategorySnapshot(
+            demand_templates, {}, margin_threshold, min_score,
+            dtype=np.float32 if precision == "fp32" else np.float16,
+            projection=EmbeddingProjection(projection, projection_dim) if projection else None,
+            embedding_key=self.model_key
+        )
+        
+        if background_loading:
+            threading.Thread(
+                target=self._initialize_in_background, name="IntentClassifierLoader", daemon=True
+            ).start()
+        else:
+            self._initialize_model()
+            self._ready.set_result(True)
     
     def _initialize_model(self):
         """Initialize the model and compute category embeddings"""
         try:
-            print(f"🤖 Loading model {self.model_name}...")
-            self.model = SentenceTransformer(self.model_name)
+            self.model, self._encode_lock = self.model_registry.acquire(self.model_key, self._load_model)
+            self._release_model = weakref.finalize(self, self.model_registry.release, self.model_key)
+            # Nothing to free when the process exits
+            self._release_model.atexit = False
             self._compute_category_embeddings()
+            if self.embedding_cache is not None:
+                self.embedding_cache.bind(self.embedding_key)
+            if self.warm_up:
+                self._warm_up()
             print("✅ Model initialized successfully")
         except Exception as e:
             print(f"❌ Error during model initialization: {e}")
             raise
     
+    def _load_model(self):
+        """Load the encoder, called by the model registry when no classifier holds it yet"""
+        print(f"🤖 Loading model {self.model_key}...")
+        model = load_sentence_model(self.model_name, self.backend, self.export_dir, self.quantize, self.precision)
+        # Part of model_key, so classifiers sharing the encoder agree on it
+        if self.max_seq_length is not None:
+            model.max_seq_length = self.max_seq_length
+        return model
+    
+    def _initialize_in_background(self):
+        """Initialize the model and resolve the readiness future"""
+        try:
+            self._initialize_model()
+        except Exception as e:
+            self._ready.set_exception(e)
+        else:
+            self._ready.set_result(True)
+    
+    def _warm_up(self):
+        """Run a throwaway forward pass so the first real request does not pay one-time setup costs"""
+        phrases = next((phrases for phrases in self.demand_templates.values() if phrases), ["warm up"])
+        self._encode_uncached(list(phrases[:1]))
+    
+    @property
+    def model_key(self):
+        """str: Identifier of the encoder variant, used to key cached embeddings"""
+        key = self.model_name
+        if self.backend != "torch":
+            key += f"@{self.backend}"
+        if self.quantize:
+            key += "-int8"
+        if self.precision == "bf16":
+            key += "-bf16"
+        if self.max_seq_length is not None:
+            key += f"-max{self.max_seq_length}"
+        return key
+    
+    @property
+    def embedding_key(self):
+        """str: Identifier of the encoder variant and projection producing the scored embeddings"""
+        return self._snapshot.embedding_key
+    
+    @property
+    def projection(self):
+        """EmbeddingProjection: Projection of the current embeddings, None keeps the full width"""
+        return self._snapshot.projection
+    
+    def _embedding_key(self, projection):
+        """Return the embedding key of the encoder combined with a projection"""
+        if projection is not None and projection.is_fitted:
+            return f"{self.model_key}-{projection.key}"
+        return self.model_key
+    
+    @property
+    def snapshot(self):
+        """CategorySnapshot: The current immutable categories and thresholds"""
+        return self._snapshot
+    
+    @property
+    def demand_templates(self):
+        """Mapping: Example phrases by category (read-only)"""
+        return self._snapshot.templates
+    
+    @property
+    def category_embeddings(self):
+        """Mapping: Mean embedding by category (read-only)"""
+        return self._snapshot.category_embeddings
+    
+    @property
+    def template_embeddings(self):
+        """Mapping: Phrase embeddings by category (read-only)"""
+        return self._snapshot.template_embeddings
+    
+    @property
+    def category_names(self):
+        """tuple: Category names in category_matrix row order"""
+        return self._snapshot.category_names
+    
+    @property
+    def category_matrix(self):
+        """np.ndarray: Stacked L2-normalized category embeddings"""
+        return self._snapshot.category_matrix
+    
+    @property
+    def margin_threshold(self):
+        """float: Minimum difference threshold between top two categories"""
+        return self._snapshot.margin_threshold
+    
+    @margin_threshold.setter
+    def margin_threshold(self, threshold):
+        with self._write_lock:
+            self._snapshot = self._snapshot.with_thresholds(margin_threshold=threshold)
+    
+    @property
+    def min_score(self):
+        """float: Minimum similarity of the top category"""
+        return self._snapshot.min_score
+    
+    @property
+    def ready_future(self):
+        """Future: Resolved once the model is loaded, or set to the loading error"""
+        return self._ready
+    
+    def is_ready(self):
+        """Return True once the model is loaded and categories are encoded"""
+        return self._ready.done() and self._ready.exception() is None
+    
+    def wait_ready(self, timeout=None):
+        """
+        Block until the model is loaded
+        
+        Args:
+            timeout (float): Maximum number of seconds to wait, None waits forever
+        
+        Returns:
+            bool: True if the model is ready, False if the timeout expired
+        
+        Raises:
+            Exception: The error raised while loading the model
+        """
+        try:
+            self._ready.result(timeout=timeout)
+            return True
+        except FutureTimeoutError:
+            return False
+    
     def _compute_category_embeddings(self):
         """Compute average embeddings for each intent category"""
         try:
-            self.category_embeddings = {
-                intent: torch.mean(self.model.encode(phrases, convert_to_tensor=True), dim=0)
-                for intent, phrases in self.demand_templates.items()
+            templates = self.demand_templates
+            template_embeddings = {
+                intent: self._encode_templates(list(phrases))
+                for intent, phrases in templates.items()
+            }
+            projection = self._snapshot.projection
+            if projection is not None and not projection.is_fitted and template_embeddings:
+                projection = self._fit_projection(projection, template_embeddings)
+            template_embeddings = {
+                intent: self._project(embeddings, projection) for intent, embeddings in template_embeddings.items()
             }
-            print(f"📊 Embeddings computed for {len(self.category_embeddings)} categories")
+            with self._write_lock:
+                snapshot = CategorySnapshot(
+                    templates, template_embeddings, self._snapshot.margin_threshold, self._snapshot.min_score,
+                    dtype=self._snapshot.dtype, projection=projection, embedding_key=self._embedding_key(projection)
+                )
+                self._snapshot = self._with_cascade(snapshot.with_index(self._build_index(snapshot)))
+            print(f"📊 Embeddings computed for {len(template_embeddings)} categories")
         except Exception as e:
             print(f"❌ Error during embeddings computation: {e}")
             raise
     
+    def _fit_projection(self, projection, template_embeddings):
+        """
+        Fit a copy of the configured projection on the full-width template embeddings and the extra fit texts
+        
+        Args:
+            projection (EmbeddingProjection): The unfitted configured projection
+            template_embeddings (dict): Full-width phrase embeddings by category
+        
+        Returns:
+            EmbeddingProjection: The fitted projection
+        """
+        samples = list(template_embeddings.values())
+        if self.projection_fit_texts:
+            samples.append(self._encode_uncached(self.projection_fit_texts))
+        samples = np.concatenate(samples)
+        fitted = EmbeddingProjection(projection.method, projection.dim).fit(samples)
+        print(f"📐 {fitted.method} projection fitted on {len(samples)} embeddings: {samples.shape[1]} → {fitted.dim} dimensions")
+        return fitted
+    
+    def _project(self, embeddings, projection):
+        """Reduce full-width encoder embeddings with a snapshot projection, if it is fitted"""
+        if projection is None or not projection.is_fitted:
+            return embeddings
+        return projection.transform(embeddings)
+    
+    def _encode_templates(self, phrases):
+        """
+        Encode the template phrases of a category, reusing the on-disk cache when possible
+        
+        Args:
+            phrases (list): Template phrases of the category
+        
+        Returns:
+            np.ndarray: Phrase embeddings of shape [num_phrases, dim]
+        """
+        if self.template_store is not None:
+            embeddings = self.template_store.load(self.model_key, phrases)
+            if embeddings is not None:
+                return embeddings
+        
+        embeddings = self._encode_uncached(phrases)
+        if self.template_store is not None:
+            try:
+                self.template_store.save(self.model_key, phrases, embeddings)
+            except OSError as e:
+                print(f"⚠️ Could not write template embedding cache: {e}")
+        return embeddings
+    
+    def _build_index(self, snapshot):
+        """
+        Build the nearest-neighbor index over every category of a snapshot
+        
+        Returns:
+            The index, or None when every category is scored
+        """
+        if self._empty_index is None or snapshot.category_matrix is None:
+            return None
+        return self._empty_index.with_added(snapshot.category_names, snapshot.category_matrix)
+    
+    def _update_index(self, index, intent_name, row=None):
+        """
+        Replace or remove one category in the nearest-neighbor index without rebuilding it
+        
+        Args:
+            index: Index of the current snapshot, None when every category is scored
+            intent_name (str): Name of the changed category
+            row (np.ndarray): New normalized mean embedding of the category, None removes the category
+        
+        Returns:
+            The updated index
+        """
+        if self._empty_index is None:
+            return None
+        # The first category of a classifier starts from the empty index
+        index = self._empty_index if index is None else index
+        if intent_name in index:
+            index = index.with_removed([intent_name])
+        if row is not None:
+            index = index.with_added([intent_name], row[None])
+        return index
+    
+    def _with_cascade(self, snapshot):
+        """
+        Attach a lexical cascade trained on the categories of a snapshot
+        Training takes milliseconds on template-sized data, so it runs on every category change
+        
+        Returns:
+            CategorySnapshot: The snapshot, with a cascade when it is enabled and there are two categories or more
+        """
+        if not self.lexical_cascade or len(snapshot.templates) < 2:
+            return snapshot.with_cascade(None) if snapshot.cascade is not None else snapshot
+        cascade = LexicalCascade(self.lexical_margin, self.lexical_features)
+        return snapshot.with_cascade(cascade.fit(snapshot.templates, self._lexical_examples))
+    
+    def train_lexical_cascade(self, labeled_examples):
+        """
+        Add labeled utterances to the lexical cascade training data and retrain it
+        The examples are only used by the lexical stage, the category embeddings do not change
+        
+        Args:
+            labeled_examples (dict): Utterances by category, e.g. transcripts of past requests
+        """
+        if not self.lexical_cascade:
+            raise RuntimeError("The lexical cascade is disabled, create the classifier with lexical_cascade=True")
+        
+        self._ready.result()
+        with self._write_lock:
+            for intent, examples in labeled_examples.items():
+                self._lexical_examples.setdefault(intent, []).extend(examples)
+            self._snapshot = self._with_cascade(self._snapshot)
+        
+        count = sum(len(examples) for examples in labeled_examples.values())
+        print(f"✅ Lexical cascade retrained with {count} extra examples")
+    
+    def cascade_info(self):
+        """
+        Return lexical cascade statistics
+        
+        Returns:
+            CascadeInfo: Hits, misses, hit rate, audited answers and their agreement with the
+            encoder (None until an answer is audited), or None if the cascade is disabled
+        """
+        if self.cascade_stats is None:
+            return None
+        return self.cascade_stats.info()
+    
     def add_intent_category(self, intent_name, example_phrases):
         """
         Add a new intent category
@@ -91,12 +964,22 @@ class IntentClassifier:
             if not example_phrases:
                 raise ValueError("Example phrases list cannot be empty")
             
-            self.demand_templates[intent_name] = example_phrases
+            self._ready.result()
             
-            # Recalculate embedding for this category
-            self.category_embeddings[intent_name] = torch.mean(
-                self.model.encode(example_phrases, convert_to_tensor=True), dim=0
-            )
+            # Recalculate embedding for this category, outside the write lock
+            full_embeddings = self._encode_templates(list(example_phrases))
+            
+            with self._write_lock:
+                snapshot = self._snapshot
+                # Projected under the lock, with the projection of the snapshot being replaced
+                embeddings = self._project(full_embeddings, snapshot.projection)
+                row = _mean_direction(embeddings)
+                self._snapshot = self._with_cascade(snapshot.with_categories(
+                    {**snapshot.templates, intent_name: example_phrases},
+                    {**snapshot.template_embeddings, intent_name: embeddings},
+                    {intent_name: row},
+                    self._update_index(snapshot.index, intent_name, row)
+                ))
             
             print(f"✅ Category '{intent_name}' added with {len(example_phrases)} examples")
             
@@ -112,12 +995,19 @@ class IntentClassifier:
             intent_name (str): Name of the category to remove
         """
         try:
-            if intent_name not in self.demand_templates:
-                print(f"⚠️ Category '{intent_name}' does not exist")
-                return False
+            self._ready.result()
             
-            del self.demand_templates[intent_name]
-            del self.category_embeddings[intent_name]
+            with self._write_lock:
+                snapshot = self._snapshot
+                if intent_name not in snapshot.templates:
+                    print(f"⚠️ Category '{intent_name}' does not exist")
+                    return False
+                
+                self._snapshot = self._with_cascade(snapshot.with_categories(
+                    {k: v for k, v in snapshot.templates.items() if k != intent_name},
+                    {k: v for k, v in snapshot.template_embeddings.items() if k != intent_name},
+                    index=self._update_index(snapshot.index, intent_name)
+                ))
             
             print(f"✅ Category '{intent_name}' removed")
             return True
@@ -126,52 +1016,549 @@ class IntentClassifier:
             print(f"❌ Error removing category '{intent_name}': {e}")
             return False
     
-    def classify(self, text):
+    def add_examples(self, intent_name, phrases):
         """
-        Classify input text into an intent category
-        If the top two categories are too close, classify as 'other'
+        Add example phrases to a category, encoding only the new phrases
+        The category is created if it does not exist yet
         
         Args:
-            text (str): The input sentence to classify
-        
-        Returns:
-            tuple[str, float]: Predicted intent or 'other', and its confidence score
+            intent_name (str): Name of the category
+            phrases (list): New example phrases
         """
         try:
-            if not text or not text.strip():
-                return "other", 0.0
+            if not phrases:
+                raise ValueError("Example phrases list cannot be empty")
             
-            if not self.model or not self.category_embeddings:
-                raise RuntimeError("Model is not initialized")
+            self._ready.result()
             
-            # Encode input text
-            user_embedding = self.model.encode(text, convert_to_tensor=True)
+            # Only the new phrases go through the encoder, outside the write lock
+            full_embeddings = self._encode_uncached(list(phrases))
             
-            # Calculate similarities with each category
-            similarities = {
-                intent: util.cos_sim(user_embedding, emb).item()
-                for intent, emb in self.category_embeddings.items()
-            }
+            with self._write_lock:
+                snapshot = self._snapshot
+                new_embeddings = self._project(full_embeddings, snapshot.projection)
+                old_phrases = snapshot.templates.get(intent_name, ())
+                old_embeddings = snapshot.template_embeddings.get(intent_name)
+                
+                all_phrases = list(old_phrases) + list(phrases)
+                all_embeddings = (
+                    new_embeddings if old_embeddings is None
+                    else np.concatenate([old_embeddings, new_embeddings])
+                )
+                row = _mean_direction(all_embeddings)
+                self._snapshot = self._with_cascade(snapshot.with_categories(
+                    {**snapshot.templates, intent_name: all_phrases},
+                    {**snapshot.template_embeddings, intent_name: all_embeddings},
+                    {intent_name: row},
+                    self._update_index(snapshot.index, intent_name, row)
+                ))
             
-            # Sort by similarity score in descending order
-            sorted_sims = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
+            # The store holds full-width float32 encoder output: projected embeddings and embeddings
+            # already rounded to a reduced-precision snapshot cannot be written back
+            if self.template_store is not None and snapshot.projection is None and snapshot.dtype == np.float32:
+                try:
+                    self.template_store.save(self.model_key, all_phrases, all_embeddings)
+                except OSError as e:
+                    print(f"⚠️ Could not write template embedding cache: {e}")
             
-            if not sorted_sims:
-                return "other", 0.0
+            print(f"✅ {len(phrases)} examples added to '{intent_name}' ({len(all_phrases)} total)")
             
-            top_intent, top_score = sorted_sims[0]
-            second_score = sorted_sims[1][1] if len(sorted_sims) > 1 else 0.0
+        except Exception as e:
+            print(f"❌ Error adding examples to '{intent_name}': {e}")
+            raise
+    
+    def remove_examples(self, intent_name, phrases):
+        """
+        Remove example phrases from a category without re-encoding the remaining ones
+        
+        Args:
+            intent_name (str): Name of the category
+            phrases (list): Example phrases to remove, every occurrence is removed
+        
+        Returns:
+            int: Number of removed examples
+        """
+        try:
+            self._ready.result()
             
-            # Check if difference is sufficient and minimum score is met
-            if top_score - second_score <= self.margin_threshold or top_score < 0.2:
-                return "other", top_score - second_score
+            with self._write_lock:
+                snapshot = self._snapshot
+                if intent_name not in snapshot.templates:
+                    print(f"⚠️ Category '{intent_name}' does not exist")
+                    return 0
+                
+                removed = set(phrases)
+                old_phrases = snapshot.templates[intent_name]
+                keep = [i for i, phrase in enumerate(old_phrases) if phrase not in removed]
+                dropped = [i for i, phrase in enumerate(old_phrases) if phrase in removed]
+                if not dropped:
+                    return 0
+                if not keep:
+                    raise ValueError("Cannot remove every example, use remove_intent_category instead")
+                
+                kept_embeddings = np.asarray(snapshot.template_embeddings[intent_name][keep])
+                row = _mean_direction(kept_embeddings)
+                self._snapshot = self._with_cascade(snapshot.with_categories(
+                    {**snapshot.templates, intent_name: [old_phrases[i] for i in keep]},
+                    {**snapshot.template_embeddings, intent_name: kept_embeddings},
+                    {intent_name: row},
+                    self._update_index(snapshot.index, intent_name, row)
+                ))
             
-            return top_intent, top_score
+            print(f"✅ {len(dropped)} examples removed from '{intent_name}' ({len(keep)} left)")
+            return len(dropped)
+            
+        except Exception as e:
+            print(f"❌ Error removing examples from '{intent_name}': {e}")
+            raise
+    
+    def _encode(self, texts, snapshot, batch_size=32, timings=None):
+        """
+        Encode input texts, serving repeated utterances from the embedding cache
+        Embeddings are projected before being cached, so the cache holds reduced vectors
+        
+        Args:
+            texts (list): Non-empty input sentences
+            snapshot (CategorySnapshot): Snapshot the embeddings are scored against, gives the
+                projection and the cache key
+            batch_size (int): Number of sentences per encoder forward pass
+            timings (dict): Optional stage durations in milliseconds, incremented in place
+        
+        Returns:
+            np.ndarray: Embeddings of shape [num_texts, dim]
+        """
+        cache = self.embedding_cache
+        if cache is None:
+            return self._project(self._encode_uncached(texts, batch_size, timings), snapshot.projection)
+        
+        keys = [normalize_text(text) for text in texts]
+        embeddings = [cache.get(key, snapshot.embedding_key) for key in keys]
+        
+        # Encode each distinct missing utterance once
+        missing = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            encoded = self._project(
+                self._encode_uncached([texts[i] for i in missing.values()], batch_size, timings), snapshot.projection
+            )
+            computed = dict(zip(missing.keys(), encoded))
+            for key, embedding in computed.items():
+                cache.put(key, embedding, snapshot.embedding_key)
+            embeddings = [
+                computed[key] if embedding is None else embedding
+                for key, embedding in zip(keys, embeddings)
+            ]
+        
+        return np.stack(embeddings)
+    
+    def _encode_uncached(self, texts, batch_size=32, timings=None):
+        """
+        Run the encoder on a list of texts
+        
+        Args:
+            texts (list): Input sentences
+            batch_size (int): Number of sentences per encoder forward pass
+            timings (dict): Optional stage durations in milliseconds, incremented in place
+        
+        Returns:
+            np.ndarray: Embeddings of shape [num_texts, dim]
+        """
+        # The encoder lock is only held while tokenizing, forward passes of other threads overlap
+        # A single text has no padding
+        if self.length_bucketing and len(texts) > 1:
+            return encode_length_bucketed(self.model, texts, batch_size, self.padding_stats, timings, self._encode_lock)
+        
+        # Longest texts first, like SentenceTransformer.encode(), so batches hold texts of similar length
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        batches = [
+            encode_staged(self.model, [texts[i] for i in order[start:start + batch_size]], timings, self._encode_lock)
+            for start in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.empty((len(texts), batches[0].shape[1]), dtype=batches[0].dtype)
+        embeddings[order] = np.concatenate(batches)
+        return embeddings
+    
+    def cache_info(self):
+        """
+        Return utterance embedding cache statistics
+        
+        Returns:
+            CacheInfo: Hits, misses, sizes and limits, or None if the cache is disabled
+        """
+        if self.embedding_cache is None:
+            return None
+        return self.embedding_cache.cache_info()
+    
+    def padding_info(self):
+        """
+        Return the padding statistics of batched encoder calls
+        
+        Returns:
+            PaddingInfo: Batches, real and padding tokens, overall padding ratio and the ratio of
+            the most recent batches, or None if length bucketing is disabled
+        """
+        if self.padding_stats is None:
+            return None
+        return self.padding_stats.info()
+    
+    def memory_info(self):
+        """
+        Return the memory held by the encoder weights, the category embeddings and the utterance cache
+        
+        Returns:
+            MemoryInfo: Sizes in bytes (encoder_bytes is 0 with the ONNX backend) and the precision
+        """
+        model = self.model
+        cache = self.cache_info()
+        return MemoryInfo(
+            model_nbytes(model) if model is not None else 0,
+            self._snapshot.nbytes,
+            cache.nbytes if cache is not None else 0,
+            self.precision
+        )
+    
+    def _score(self, embeddings, snapshot):
+        """
+        Compute cosine similarities between input embeddings and every category
+        
+        Args:
+            embeddings (np.ndarray): Input embeddings of shape [num_texts, dim]
+            snapshot (CategorySnapshot): Categories to score against
+        
+        Returns:
+            np.ndarray: Similarity matrix of shape [num_texts, num_intents]
+        """
+        queries = _normalize_rows(embeddings.astype(np.float32))
+        if self.scoring == "centroid":
+            return dot_scores(queries, snapshot.category_matrix)
+        
+        # k-NN: score every example, then aggregate per category
+        example_matrix, offsets, labels = snapshot.example_index
+        similarities = dot_scores(queries, example_matrix)
+        if self.knn_aggregation == "max":
+            # Examples of a category are contiguous, so this is one pass over the row
+            return np.maximum.reduceat(similarities, offsets, axis=1)
+        
+        # Similarity-weighted vote of the k nearest examples, found with a partial sort
+        k = min(self.knn_k, similarities.shape[1])
+        rows = np.arange(similarities.shape[0])[:, None]
+        nearest = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        scores = np.zeros((similarities.shape[0], len(offsets)), dtype=np.float32)
+        np.add.at(scores, (np.broadcast_to(rows, nearest.shape), labels[nearest]), similarities[rows, nearest])
+        return scores / k
+    
+    def _analyze_batch(self, texts, batch_size=32, snapshot=None):
+        """
+        Encode and score texts in a single pass
+        Both classify() and get_classification_details() are views over the returned results
+        
+        Args:
+            texts (list): The input sentences to analyze
+            batch_size (int): Number of sentences per encoder forward pass
+            snapshot (CategorySnapshot): Categories and thresholds to use, the current ones by default
+        
+        Returns:
+            list[ClassificationResult]: One result per input text, in input order
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            return self._run_stages(texts, batch_size, snapshot)
+        
+        timings = {}
+        start = time.perf_counter()
+        try:
+            results = self._run_stages(texts, batch_size, snapshot, timings)
+        except Exception as e:
+            instrumentation.record_error(e, timings, (time.perf_counter() - start) * 1000)
+            raise
+        instrumentation.record_call(results, timings, (time.perf_counter() - start) * 1000)
+        return results
+    
+    def _run_stages(self, texts, batch_size, snapshot, timings=None):
+        """
+        Run the lexical, encoder, similarity and decision stages of _analyze_batch()
+        
+        Args:
+            texts (list): The input sentences to analyze
+            batch_size (int): Number of sentences per encoder forward pass
+            snapshot (CategorySnapshot): Categories and thresholds to use, the current ones by default
+            timings (dict): Optional stage durations in milliseconds, filled in place
+        
+        Returns:
+            list[ClassificationResult]: One result per input text, in input order
+        """
+        self._ready.result()
+        snapshot = snapshot or self._snapshot
+        if not self.model or snapshot.category_matrix is None:
+            raise RuntimeError("Model is not initialized")
+        
+        # Empty inputs are classified as 'other' without being encoded
+        results = [ClassificationResult(text, "other", 0.0) for text in texts]
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
+            return results
+        
+        # Confident near-verbatim inputs are answered by the lexical stage without being encoded
+        lexical = {}
+        if snapshot.cascade is not None:
+            start = time.perf_counter()
+            lexical = self._lexical_results(texts, indices, snapshot)
+            if timings is not None:
+                add_timing(timings, "lexical", start)
+        audited = [i for i in lexical if random.random() < self.lexical_audit_rate]
+        if lexical:
+            encoded = set(audited)
+            indices = [i for i in indices if i not in lexical or i in encoded]
+        
+        if indices:
+            self._encoder_results(texts, indices, snapshot, batch_size, results, timings)
+        
+        if lexical:
+            agreed = sum(results[i].predicted_intent == lexical[i].predicted_intent for i in audited)
+            self.cascade_stats.record_audit(len(audited), agreed)
+            for i, result in lexical.items():
+                results[i] = result
+        
+        return results
+    
+    def _lexical_results(self, texts, indices, snapshot):
+        """
+        Run the lexical cascade and keep the predictions confident enough to skip the encoder
+        
+        Args:
+            texts (list): The input sentences
+            indices (list): Positions of the non-empty sentences
+            snapshot (CategorySnapshot): Snapshot holding the cascade
+        
+        Returns:
+            dict: ClassificationResult by input position, for the answered inputs only
+        """
+        cascade = snapshot.cascade
+        intents, confidences, accepted, probabilities = cascade.predict([texts[i] for i in indices])
+        hits = {
+            index: ClassificationResult(
+                texts[index], intents[row], float(confidences[row]), probabilities[row], cascade.classes, stage="lexical"
+            )
+            for row, index in enumerate(indices) if accepted[row]
+        }
+        self.cascade_stats.record(len(hits), len(indices) - len(hits))
+        return hits
+    
+    def _encoder_results(self, texts, indices, snapshot, batch_size, results, timings=None):
+        """
+        Encode and score the selected texts, storing their results in place
+        
+        Args:
+            texts (list): The input sentences
+            indices (list): Positions of the sentences to encode
+            snapshot (CategorySnapshot): Categories and thresholds to use
+            batch_size (int): Number of sentences per encoder forward pass
+            results (list): Results of every input, updated at the given positions
+            timings (dict): Optional stage durations in milliseconds, filled in place
+        """
+        # Encode all input texts together
+        user_embeddings = self._encode([texts[i] for i in indices], snapshot, batch_size, timings)
+        
+        start = time.perf_counter()
+        if snapshot.index is not None:
+            # Only the categories found by the index are scored and kept in the breakdown
+            names, scores = snapshot.index.search(
+                _normalize_rows(user_embeddings.astype(np.float32)), INDEX_CANDIDATES
+            )
+            if timings is not None:
+                add_timing(timings, "similarity", start)
+                start = time.perf_counter()
+            for row, index in enumerate(indices):
+                found = int(np.count_nonzero(np.isfinite(scores[row])))
+                if found == 0:
+                    # The probed clusters can all be empty after removals, -inf scores are not valid JSON
+                    results[index] = ClassificationResult(texts[index], "other", 0.0)
+                    continue
+                second_score = float(scores[row, 1]) if found > 1 else 0.0
+                intent, confidence = self._apply_decision_rule(
+                    names[row, 0], float(scores[row, 0]), second_score, snapshot
+                )
+                results[index] = ClassificationResult(
+                    texts[index], intent, confidence, scores[row, :found], tuple(names[row, :found])
+                )
+            if timings is not None:
+                add_timing(timings, "decision", start)
+            return
+        
+        # Similarity matrix of shape [num_texts, num_intents]
+        scores = self._score(user_embeddings, snapshot)
+        top_indices, top_scores, second_scores = _top_two(scores)
+        if timings is not None:
+            add_timing(timings, "similarity", start)
+            start = time.perf_counter()
+        
+        category_names = snapshot.category_names
+        for row, index in enumerate(indices):
+            intent, confidence = self._apply_decision_rule(
+                category_names[top_indices[row]], float(top_scores[row]), float(second_scores[row]), snapshot
+            )
+            results[index] = ClassificationResult(
+                texts[index], intent, confidence, scores[row], category_names
+            )
+        if timings is not None:
+            add_timing(timings, "decision", start)
+    
+    def analyze_batch(self, texts, batch_size=32):
+        """
+        Classify several input texts and keep the full score breakdown of each
+        
+        Args:
+            texts (list): The input sentences to analyze
+            batch_size (int): Number of sentences per encoder forward pass
+        
+        Returns:
+            list[ClassificationResult]: One result per input text, in input order
+        """
+        return self._analyze_batch(texts, batch_size)
+    
+    def rank_intents(self, texts, k=5, batch_size=32):
+        """
+        Return the k most similar categories of each input text, without the decision rule
+        The nearest-neighbor index is used when one is configured
+        
+        Args:
+            texts (list): The input sentences to rank
+            k (int): Number of categories returned per text
+            batch_size (int): Number of sentences per encoder forward pass
+        
+        Returns:
+            list[list[tuple[str, float]]]: Best categories and their similarity, best first, in input order
+        """
+        self._ready.result()
+        snapshot = self._snapshot
+        if not self.model or snapshot.category_matrix is None:
+            raise RuntimeError("Model is not initialized")
+        
+        rankings = [[] for _ in texts]
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
+            return rankings
+        
+        user_embeddings = self._encode([texts[i] for i in indices], snapshot, batch_size)
+        if snapshot.index is not None:
+            names, scores = snapshot.index.search(_normalize_rows(user_embeddings.astype(np.float32)), k)
+        else:
+            columns, scores = top_k(self._score(user_embeddings, snapshot), k)
+            names = np.array(snapshot.category_names, dtype=object)[columns]
+        
+        for row, index in enumerate(indices):
+            rankings[index] = [
+                (name, float(score)) for name, score in zip(names[row], scores[row]) if name is not None
+            ]
+        return rankings
+    
+    def classify(self, text):
+        """
+        Classify input text into an intent category
+        If the top two categories are too close, classify as 'other'
+        
+        Args:
+            text (str): The input sentence to classify
+        
+        Returns:
+            tuple[str, float]: Predicted intent or 'other', and its confidence score
+        """
+        try:
+            return self._analyze_batch([text])[0].as_tuple()
             
         except Exception as e:
             print(f"❌ Error during classification: {e}")
             return "other", 0.0
     
+    def classify_batch(self, texts, batch_size=32):
+        """
+        Classify several input texts at once
+        All texts are encoded together and scored against every category
+        in a single operation, with the same rules as classify()
+        
+        Args:
+            texts (list): The input sentences to classify
+            batch_size (int): Number of sentences per encoder forward pass
+        
+        Returns:
+            list[tuple[str, float]]: Predicted intent or 'other' and its confidence score, in input order
+        """
+        try:
+            return [result.as_tuple() for result in self._analyze_batch(texts, batch_size)]
+            
+        except Exception as e:
+            print(f"❌ Error during batch classification: {e}")
+            return [("other", 0.0)] * len(texts)
+    
+    def _apply_decision_rule(self, top_intent, top_score, second_score, snapshot):
+        """
+        Apply the margin and minimum score rules to the two best categories
+        
+        Args:
+            top_intent (str): Best scoring category
+            top_score (float): Similarity of the best category
+            second_score (float): Similarity of the second best category
+            snapshot (CategorySnapshot): Snapshot holding the thresholds
+        
+        Returns:
+            tuple[str, float]: Predicted intent or 'other', and its confidence score
+        """
+        # Check if difference is sufficient and minimum score is met
+        if top_score - second_score <= snapshot.margin_threshold or top_score < snapshot.min_score:
+            return "other", top_score - second_score
+        
+        return top_intent, top_score
+    
+    def export_state(self):
+        """
+        Export categories, their embeddings and the thresholds as plain picklable data
+        
+        Returns:
+            dict: State accepted by load_state()
+        """
+        snapshot = self._snapshot
+        return {
+            "model_key": self.model_key,
+            "templates": {intent: list(phrases) for intent, phrases in snapshot.templates.items()},
+            "template_embeddings": {
+                intent: np.asarray(embeddings) for intent, embeddings in snapshot.template_embeddings.items()
+            },
+            "margin_threshold": snapshot.margin_threshold,
+            "min_score": snapshot.min_score,
+            "lexical_examples": {intent: list(examples) for intent, examples in self._lexical_examples.items()},
+            "projection": snapshot.projection.export_state() if snapshot.projection is not None else None
+        }
+    
+    def load_state(self, state):
+        """
+        Replace categories, embeddings and thresholds with an exported state, without re-encoding
+        
+        Args:
+            state (dict): State returned by export_state() on a classifier using the same model
+        """
+        if state["model_key"] != self.model_key:
+            raise ValueError(f"State was computed with {state['model_key']}, not {self.model_key}")
+        
+        # The embeddings are only meaningful with the projection they were reduced with
+        projection = state.get("projection")
+        projection = EmbeddingProjection.from_state(projection) if projection else None
+        with self._write_lock:
+            self._lexical_examples = {
+                intent: list(examples) for intent, examples in state.get("lexical_examples", {}).items()
+            }
+            snapshot = CategorySnapshot(
+                state["templates"], state["template_embeddings"],
+                state["margin_threshold"], state["min_score"], dtype=self._snapshot.dtype,
+                projection=projection, embedding_key=self._embedding_key(projection)
+            )
+            self._snapshot = self._with_cascade(snapshot.with_index(self._build_index(snapshot)))
+            # Entries of another projection are dropped, readers of the previous snapshot
+            # neither read nor store entries under the new key
+            if self.embedding_cache is not None:
+                self.embedding_cache.bind(snapshot.embedding_key)
+    
     def get_intent_categories(self):
         """Return the list of available intent categories"""
         return list(self.demand_templates.keys())
@@ -186,7 +1573,7 @@ class IntentClassifier:
         Returns:
             list: List of examples for this category
         """
-        return self.demand_templates.get(intent_name, [])
+        return list(self.demand_templates.get(intent_name, ()))
     
     def set_margin_threshold(self, threshold):
         """
@@ -201,6 +1588,17 @@ class IntentClassifier:
         self.margin_threshold = threshold
         print(f"✅ Margin threshold updated: {threshold}")
     
+    def set_min_score(self, min_score):
+        """
+        Modify the minimum similarity required for the top category
+        
+        Args:
+            min_score (float): New minimum score
+        """
+        with self._write_lock:
+            self._snapshot = self._snapshot.with_thresholds(min_score=min_score)
+        print(f"✅ Minimum score updated: {min_score}")
+    
     def get_classification_details(self, text):
         """
         Return complete details about text classification
@@ -215,43 +1613,147 @@ class IntentClassifier:
             if not text or not text.strip():
                 return {"error": "Empty text"}
             
-            if not self.model or not self.category_embeddings:
+            self._ready.result()
+            snapshot = self._snapshot
+            if not self.model or snapshot.category_matrix is None:
                 return {"error": "Model not initialized"}
             
-            # Encode input text
-            user_embedding = self.model.encode(text, convert_to_tensor=True)
-            
-            # Calculate similarities with each category
-            similarities = {
-                intent: util.cos_sim(user_embedding, emb).item()
-                for intent, emb in self.category_embeddings.items()
-            }
-            
-            # Sort by score
-            sorted_sims = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
-            
-            predicted_intent, confidence = self.classify(text)
+            # Decision and score breakdown come from the same scoring pass
+            result = self._analyze_batch([text], snapshot=snapshot)[0]
             
             return {
                 "input_text": text,
-                "predicted_intent": predicted_intent,
-                "confidence": confidence,
-                "all_scores": dict(sorted_sims),
-                "margin_threshold": self.margin_threshold,
-                "model_name": self.model_name
+                "predicted_intent": result.predicted_intent,
+                "confidence": result.confidence,
+                "all_scores": result.all_scores,
+                "margin_threshold": snapshot.margin_threshold,
+                "min_score": snapshot.min_score,
+                "model_name": self.model_name,
+                "backend": self.backend,
+                "quantized": self.quantize,
+                "precision": self.precision,
+                "scoring": self.scoring,
+                "index": self.index,
+                "projection": snapshot.projection.key if snapshot.projection is not None else None,
+                "stage": result.stage
             }
             
         except Exception as e:
             return {"error": f"Error during analysis: {e}"}
     
     def cleanup(self):
-        """Clean up model resources"""
+        """
+        Clean up model resources
+        The shared encoder is freed when no other classifier uses it
+        
+        Returns:
+            ReleaseInfo: Classifiers still using the encoder and bytes of weights freed,
+            None if the classifier held no encoder
+        """
         try:
+            # Let a background load finish before releasing what it created
+            if not self._ready.done():
+                self._ready.exception()
             if self.model:
-                # SentenceTransformer doesn't have a specific cleanup method
-                # but we can release references
                 self.model = None
-                self.category_embeddings = {}
-                print("✅ Classifier resources cleaned up")
+                released = self._release_model()
+                with self._write_lock:
+                    self._snapshot = self._snapshot.with_categories(self._snapshot.templates, {})
+                if self.embedding_cache is not None:
+                    self.embedding_cache.clear()
+                if released.references:
+                    print(f"✅ Classifier resources cleaned up, encoder still used by {released.references} classifier(s)")
+                elif released.freed_bytes:
+                    print(f"✅ Classifier resources cleaned up, {released.freed_bytes / 2**20:.1f} MB of encoder weights freed")
+                else:
+                    # ONNX Runtime weights are not visible to PyTorch
+                    print("✅ Classifier resources cleaned up, encoder released")
+                return released
         except Exception as e:
-            print(f"❌ Error during cleanup: {e}")
\ No newline at end of file
+            print(f"❌ Error during cleanup: {e}")
+        return None
+
+
+def scoring_dtype(rows, dtype):
+    """
+    Return the type a scoring matrix is stored in
+    
+    Args:
+        rows (int): Number of rows of the matrix
+        dtype (type): Storage type of the embeddings
+    
+    Returns:
+        np.dtype: float32 for matrices of at most FLOAT32_SCORING_ROWS rows, dtype otherwise
+    """
+    return np.dtype(np.float32) if rows <= FLOAT32_SCORING_ROWS else np.dtype(dtype)
+
+
+def dot_scores(queries, matrix):
+    """
+    Compute queries @ matrix.T in float32, whatever the storage type of the matrix
+    
+    NumPy has no fast float16 product: a mixed product converts the whole matrix with
+    a scalar loop on every call. float16 matrices are instead upcast by blocks of
+    SCORING_BLOCK_ROWS rows with PyTorch's vectorized conversion, so the float32 copy
+    stays cache-sized and the products run in BLAS. The conversion still dominates on
+    small matrices, which snapshots therefore keep in float32 (see scoring_dtype).
+    
+    Args:
+        queries (np.ndarray): float32 queries of shape [num_queries, dim]
+        matrix (np.ndarray): float32 or float16 matrix of shape [num_rows, dim]
+    
+    Returns:
+        np.ndarray: float32 scores of shape [num_queries, num_rows]
+    """
+    if matrix.dtype == np.float32:
+        return queries @ matrix.T
+    
+    # Imported here so that importing this module stays fast
+    import torch
+    
+    query_tensor = torch.from_numpy(np.ascontiguousarray(queries, dtype=np.float32))
+    with warnings.catch_warnings():
+        # Snapshot matrices are read-only, the tensor is only read as well
+        warnings.simplefilter("ignore", UserWarning)
+        matrix_tensor = torch.from_numpy(matrix)
+    scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+    for start in range(0, len(matrix), SCORING_BLOCK_ROWS):
+        block = matrix_tensor[start:start + SCORING_BLOCK_ROWS].float()
+        scores[:, start:start + len(block)] = torch.mm(query_tensor, block.T).numpy()
+    return scores
+
+
+def _mean_direction(embeddings):
+    """Return the L2-normalized float32 mean of the embeddings of a category, its category matrix row"""
+    mean = np.mean(embeddings, axis=0, dtype=np.float64).astype(np.float32)
+    return _normalize_rows(mean[None])[0]
+
+
+def _normalize_rows(matrix):
+    """L2-normalize each row of a matrix, leaving zero rows untouched"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _top_two(scores):
+    """
+    Select the best and second best score of each row of a similarity matrix
+    
+    Args:
+        scores (np.ndarray): Similarity matrix of shape [num_texts, num_intents]
+    
+    Returns:
+        tuple: Best column indices, best scores and second best scores (0.0 with a single category)
+    """
+    rows = np.arange(scores.shape[0])
+    if scores.shape[1] == 1:
+        return np.zeros(len(rows), dtype=np.int64), scores[:, 0], np.zeros(len(rows), dtype=scores.dtype)
+    
+    # Partial selection of the two largest columns, then order them
+    candidates = np.argpartition(-scores, 1, axis=1)[:, :2]
+    candidate_scores = scores[rows[:, None], candidates]
+    first = np.argmax(candidate_scores, axis=1)
+    top_indices = candidates[rows, first]
+    top_scores = candidate_scores[rows, first]
+    second_scores = candidate_scores[rows, 1 - first]
+    return top_indices, top_scores, second_scores
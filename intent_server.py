@@ -0,0 +1,277 @@
+import argparse
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import queue
+import threading
+import time
+
+from instrumentation import LATENCY_BUCKETS_MS, Histogram, Instrumentation
+from intent_classifier import IntentClassifier
+
+
+ENDPOINTS = ("/classify", "/classify_batch", "/details", "/categories", "/metrics")
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class BatchingWorker:
+    """Background thread merging concurrent requests into batched classifications"""
+
+    def __init__(self, classifier, max_batch_size=64, max_wait_ms=5.0):
+        """
+        Initialize the worker
+
+        Args:
+            classifier (IntentClassifier): The shared classifier
+            max_batch_size (int): Maximum number of texts encoded together
+            max_wait_ms (float): Maximum time the first request of a batch waits for others
+        """
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.batch_latency = Histogram(LATENCY_BUCKETS_MS)
+        self._queue = queue.Queue()
+        self._pending_texts = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="IntentBatchingWorker", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        """int: Number of texts waiting to be classified"""
+        return self._pending_texts
+
+    def submit(self, texts):
+        """
+        Queue texts for classification
+
+        Args:
+            texts (list): Input sentences of one request
+
+        Returns:
+            Future: Resolved with one ClassificationResult per text
+        """
+        future = Future()
+        with self._lock:
+            self._pending_texts += len(texts)
+        self._queue.put((texts, future))
+        return future
+
+    def _collect_batch(self):
+        """Wait for a first request, then gather more until the batch is full or the deadline passes"""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect_batch()
+            with self._lock:
+                self._pending_texts -= size
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            start = time.perf_counter()
+            try:
+                results = self.classifier.analyze_batch(texts, self.max_batch_size)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batch_latency.observe((time.perf_counter() - start) * 1000)
+            self.batch_sizes.observe(size)
+
+            # Hand each request its own slice of the results
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(results[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+
+class IntentRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints over a shared classifier; HTTP/1.1 keeps connections alive"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Per-request access logs are replaced by /metrics
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _classify(self, texts):
+        """Classify through the batching worker, answering 500 and returning None when it fails"""
+        try:
+            return self.server.worker.submit(texts).result()
+        except Exception as e:
+            # Answered rather than raised, so the client gets a response and the connection stays open
+            self.server.record_error()
+            self._send_json(500, {"error": f"Classification failed: {e}"})
+            return None
+
+    def do_GET(self):
+        self.server.track(self.path, self._handle_get)
+
+    def do_POST(self):
+        self.server.track(self.path, self._handle_post)
+
+    def _handle_get(self):
+        classifier = self.server.classifier
+        if self.path == "/categories":
+            categories = {intent: len(phrases) for intent, phrases in classifier.demand_templates.items()}
+            return self._send_json(200, {"categories": categories})
+        if self.path == "/metrics":
+            return self._send_json(200, self.server.metrics())
+        return self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def _handle_post(self):
+        try:
+            payload = self._read_json()
+        except (ValueError, UnicodeDecodeError):
+            return self._send_json(400, {"error": "Invalid JSON body"})
+        if not isinstance(payload, dict):
+            return self._send_json(400, {"error": "JSON body must be an object"})
+
+        if self.path in ("/classify", "/details"):
+            text = payload.get("text")
+            if not isinstance(text, str):
+                return self._send_json(400, {"error": "Field 'text' must be a string"})
+            if self.path == "/details" and not text.strip():
+                return self._send_json(400, {"error": "Empty text"})
+            results = self._classify([text])
+            if results is None:
+                return None
+            result = results[0]
+            if self.path == "/classify":
+                return self._send_json(200, {"intent": result.predicted_intent, "confidence": result.confidence})
+            snapshot = self.server.classifier.snapshot
+            return self._send_json(200, {
+                "input_text": text,
+                "predicted_intent": result.predicted_intent,
+                "confidence": result.confidence,
+                "all_scores": result.all_scores,
+                "margin_threshold": snapshot.margin_threshold,
+                "min_score": snapshot.min_score,
+                "model_name": self.server.classifier.model_name
+            })
+
+        if self.path == "/classify_batch":
+            texts = payload.get("texts")
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                return self._send_json(400, {"error": "Field 'texts' must be a list of strings"})
+            results = self._classify(texts) if texts else []
+            if results is None:
+                return None
+            return self._send_json(200, {"results": [
+                {"intent": result.predicted_intent, "confidence": result.confidence} for result in results
+            ]})
+
+        return self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+
+class IntentServer(ThreadingHTTPServer):
+    """Local HTTP inference service sharing one loaded classifier between processes"""
+
+    daemon_threads = True
+
+    def __init__(self, classifier, host="127.0.0.1", port=8765, max_batch_size=64, max_wait_ms=5.0):
+        """
+        Initialize the server
+
+        Args:
+            classifier (IntentClassifier): The shared classifier
+            host (str): Interface to bind, localhost by default
+            port (int): TCP port to listen on
+            max_batch_size (int): Maximum number of texts encoded together
+            max_wait_ms (float): Maximum time a request waits for others to join its batch
+        """
+        super().__init__((host, port), IntentRequestHandler)
+        self.classifier = classifier
+        self.worker = BatchingWorker(classifier, max_batch_size, max_wait_ms)
+        self.started = time.time()
+        self.request_latency = {}
+        self.request_errors = 0
+        self._metrics_lock = threading.Lock()
+
+    def track(self, path, handler):
+        """Run a request handler and record its latency per endpoint"""
+        path = path if path in ENDPOINTS else "unknown"
+        start = time.perf_counter()
+        try:
+            handler()
+        except Exception:
+            self.record_error()
+            raise
+        finally:
+            with self._metrics_lock:
+                histogram = self.request_latency.setdefault(path, Histogram(LATENCY_BUCKETS_MS))
+            histogram.observe((time.perf_counter() - start) * 1000)
+
+    def record_error(self):
+        """Count a failed request"""
+        with self._metrics_lock:
+            self.request_errors += 1
+
+    def metrics(self):
+        """Return service metrics as a JSON-serializable dict"""
+        with self._metrics_lock:
+            latency = dict(self.request_latency)
+            errors = self.request_errors
+        return {
+            "uptime_s": time.time() - self.started,
+            "queue_depth": self.worker.queue_depth,
+            "request_errors": errors,
+            "batch_sizes": self.worker.batch_sizes.snapshot(),
+            "batch_latency_ms": self.worker.batch_latency.snapshot(),
+            "request_latency_ms": {path: histogram.snapshot() for path, histogram in latency.items()},
+            # Per-stage classifier metrics, only when the classifier is instrumented
+            "classifier": self.classifier.instrumentation.snapshot() if self.classifier.instrumentation else None
+        }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve intent classification over HTTP on localhost")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--model", default="all-MiniLM-L12-v2", help="SentenceTransformer model to use")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Maximum number of texts encoded together")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Maximum batching delay")
+    parser.add_argument("--instrument", action="store_true", help="Report per-stage classifier timings in /metrics")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    instrumentation = Instrumentation() if args.instrument else None
+    classifier = IntentClassifier(model_name=args.model, instrumentation=instrumentation)
+    server = IntentServer(classifier, args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    print(f"🌐 Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚡ Server interrupted by user")
+    finally:
+        server.server_close()
+        classifier.cleanup()
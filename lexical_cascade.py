@@ -0,0 +1,133 @@
+from collections import namedtuple
+import threading
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+
+LEXICAL_FEATURES = ("tfidf", "hashing")
+
+CascadeInfo = namedtuple("CascadeInfo", ["hits", "misses", "hit_rate", "audited", "agreement"])
+
+
+class LexicalCascade:
+    """
+    Cheap first stage answering near-verbatim commands before the transformer
+
+    Character n-grams of the normalized text feed a logistic regression trained on
+    the template phrases and any extra labeled examples. A prediction is accepted
+    only when the gap between its two most probable categories reaches the margin,
+    everything else falls through to the encoder.
+    """
+
+    def __init__(self, margin=0.5, features="tfidf"):
+        """
+        Args:
+            margin (float): Minimum probability gap between the two best categories to answer
+            features (str): 'tfidf' learns a vocabulary, 'hashing' is stateless and uses fixed memory
+        """
+        if features not in LEXICAL_FEATURES:
+            raise ValueError(f"Unknown lexical features '{features}', expected one of {LEXICAL_FEATURES}")
+
+        self.margin = margin
+        self.features = features
+        self.classes = ()
+        self._pipeline = None
+
+    def _build_pipeline(self):
+        # Imported here so that importing this module stays fast
+        from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        # Word-boundary character n-grams are robust to typos and speech-to-text variants
+        ngrams = {"preprocessor": normalize_text, "analyzer": "char_wb", "ngram_range": (2, 4)}
+        if self.features == "tfidf":
+            vectorizer = [TfidfVectorizer(sublinear_tf=True, **ngrams)]
+        else:
+            vectorizer = [
+                HashingVectorizer(n_features=2**18, alternate_sign=False, norm=None, **ngrams),
+                TfidfTransformer(sublinear_tf=True)
+            ]
+        return make_pipeline(*vectorizer, LogisticRegression(C=10.0, max_iter=1000))
+
+    def fit(self, templates, extra_examples=None):
+        """
+        Train the stage on example phrases
+
+        Args:
+            templates (dict): Example phrases by category
+            extra_examples (dict): Additional labeled utterances by category, unknown categories are ignored
+
+        Returns:
+            LexicalCascade: self
+        """
+        texts = [text for phrases in templates.values() for text in phrases]
+        labels = [intent for intent, phrases in templates.items() for _ in phrases]
+        for intent, examples in (extra_examples or {}).items():
+            if intent in templates:
+                texts.extend(examples)
+                labels.extend([intent] * len(examples))
+        if len(set(labels)) < 2:
+            raise ValueError("The lexical cascade needs at least two categories")
+
+        self._pipeline = self._build_pipeline().fit(texts, labels)
+        self.classes = tuple(str(label) for label in self._pipeline.classes_)
+        return self
+
+    def predict(self, texts):
+        """
+        Predict the category of each text and whether the prediction is confident enough
+
+        Args:
+            texts (list): Non-empty input sentences
+
+        Returns:
+            tuple: Predicted categories, their probability, accepted mask and the
+            probability matrix [num_texts, num_classes] aligned with classes
+        """
+        probabilities = self._pipeline.predict_proba(texts)
+        order = np.argsort(-probabilities, axis=1)
+        rows = np.arange(len(texts))
+        top = probabilities[rows, order[:, 0]]
+        second = probabilities[rows, order[:, 1]] if probabilities.shape[1] > 1 else np.zeros(len(texts))
+        intents = [self.classes[i] for i in order[:, 0]]
+        return intents, top, top - second >= self.margin, probabilities.astype(np.float32)
+
+
+class CascadeStats:
+    """Thread-safe counters of the lexical stage: hit rate and agreement with the encoder"""
+
+    def __init__(self):
+        self._hits = 0
+        self._misses = 0
+        self._audited = 0
+        self._agreed = 0
+        self._lock = threading.Lock()
+
+    def record(self, hits, misses):
+        """Count answered and fallen-through utterances"""
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+
+    def record_audit(self, audited, agreed):
+        """Count answered utterances that were also classified by the encoder, and the agreements"""
+        with self._lock:
+            self._audited += audited
+            self._agreed += agreed
+
+    def clear(self):
+        """Reset every counter"""
+        with self._lock:
+            self._hits = self._misses = self._audited = self._agreed = 0
+
+    def info(self):
+        """Return the counters, hit rate and the agreement rate of audited answers"""
+        with self._lock:
+            total = self._hits + self._misses
+            return CascadeInfo(
+                self._hits, self._misses, self._hits / total if total else 0.0,
+                self._audited, self._agreed / self._audited if self._audited else None
+            )
@@ -1,7 +1,26 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
 import torch
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
+from sentence_transformers import util
 import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from intent_classifier import (
+    BACKENDS, PRECISIONS, IntentClassifier, dot_scores, encode_length_bucketed, load_sentence_model, padding_waste,
+    scoring_dtype, token_lengths
+)
+from lexical_cascade import LEXICAL_FEATURES, LexicalCascade
+from model_registry import model_nbytes
+from projection import PROJECTIONS, EmbeddingProjection
+from vector_index import INDEX_TYPES, make_index
 
 INTENTS = {
     "read_text": [
@@ -564,8 +583,9 @@ MODELS = [
     #"paraphrase-multilingual-mpnet-base-v2"
 ]
 
-def build_classifier(model_name):
-    model = SentenceTransformer(model_name)
+def build_classifier(model_name, backend="torch", quantize=False, model=None):
+    if model is None:
+        model = load_sentence_model(model_name, backend=backend, quantize=quantize)
     category_embeddings = {
         intent: torch.mean(model.encode(phrases, convert_to_tensor=True), dim=0)
         for intent, phrases in demand_templates.items()
@@ -584,7 +604,12 @@ def build_classifier(model_name):
 
     return classify
 
-def evaluate_classifier(classify_func, dataset):
+def evaluate_classifier(classify_func, dataset, warmup=5):
+    # Untimed calls so one-time initialization costs are not counted
+    warmup_texts = [text for examples in dataset.values() for text in examples][:warmup]
+    for text in warmup_texts:
+        classify_func(text)
+
     correct = 0
     total = 0
     times = []
@@ -601,10 +626,9 @@ def evaluate_classifier(classify_func, dataset):
 
     for true_intent, examples in dataset.items():
         for text in examples:
-            start = time.time()
+            start = time.perf_counter_ns()
             pred_intent, confidence = classify_func(text)
-            end = time.time()
-            elapsed = end - start
+            elapsed = (time.perf_counter_ns() - start) / 1e9
 
             category_stats[true_intent]["total"] += 1
             category_stats[true_intent]["time"].append(elapsed)
@@ -631,47 +655,1197 @@ def evaluate_classifier(classify_func, dataset):
 
     return accuracy, avg_time, incorrect, category_stats
 
-if __name__ == "__main__":
-    results = []
+def resident_memory_mb():
+    """Return the resident set size of the current process in MB (NaN if unavailable)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return float("nan")
+
+def peak_memory_mb():
+    """Return the peak resident set size of the current process in MB (NaN if unavailable)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2**20
+    except (ImportError, AttributeError):
+        return float("nan")
+
+def print_report(accuracy, avg_time, errors, stats):
+    print(f"Overall Accuracy: {accuracy*100:.2f}%")
+    print(f"Avg Time per Classification: {avg_time*1000:.2f} ms")
+    print(f"Total Errors: {len(errors)}")
+
+    print("Per-Category Breakdown:")
+    for cat, values in stats.items():
+        total_cat = values["total"]
+        correct_cat = values["correct"]
+        errors_cat = values["errors"]
+        avg_cat_time = sum(values["time"]) / total_cat * 1000 if total_cat > 0 else 0.0
+        cat_accuracy = correct_cat / total_cat * 100 if total_cat > 0 else 0.0
+
+        misclass_to_str = ", ".join(
+            f"{target}: {count}" for target, count in values["misclassified_to"].items()
+        ) if values["misclassified_to"] else "None"
+
+        misclass_from_str = ", ".join(
+            f"{source}: {count}" for source, count in values["misclassified_from"].items()
+        ) if values["misclassified_from"] else "None"
 
-    for model_name in MODELS:
-        print(f"\nEvaluating model: {model_name}")
-        classifier = build_classifier(model_name)
-        accuracy, avg_time, errors, stats = evaluate_classifier(classifier, INTENTS)
+        print(f"  {cat:30s} | Accuracy: {cat_accuracy:5.2f}% | Errors: {errors_cat:3d} | Avg Time: {avg_cat_time:6.2f} ms")
+        print(f"      Misclassified to  : {misclass_to_str}")
+        print(f"      Misclassified from: {misclass_from_str}")
 
-        print(f"Overall Accuracy: {accuracy*100:.2f}%")
-        print(f"Avg Time per Classification: {avg_time*1000:.2f} ms")
-        print(f"Total Errors: {len(errors)}")
+        # Print each example that was misclassified
+        if values["misclassified_examples"]:
+            print(f"      Misclassified examples:")
+            for ex in values["misclassified_examples"]:
+                print(f"        - \"{ex['text']}\" -> Predicted: {ex['predicted']} (Confidence: {ex['confidence']:.2f})")
 
-        print("Per-Category Breakdown:")
-        for cat, values in stats.items():
-            total_cat = values["total"]
-            correct_cat = values["correct"]
-            errors_cat = values["errors"]
-            avg_cat_time = sum(values["time"]) / total_cat * 1000 if total_cat > 0 else 0.0
-            cat_accuracy = correct_cat / total_cat * 100 if total_cat > 0 else 0.0
+def _plain_stats(stats):
+    """Convert nested defaultdicts to plain dicts so results can cross process boundaries"""
+    return {
+        cat: {key: dict(value) if isinstance(value, defaultdict) else value for key, value in values.items()}
+        for cat, values in stats.items()
+    }
 
-            misclass_to_str = ", ".join(
-                f"{target}: {count}" for target, count in values["misclassified_to"].items()
-            ) if values["misclassified_to"] else "None"
+def _evaluate_in_process(model_name, backend, quantize, threads):
+    """Evaluate one model in a worker process with its own thread budget"""
+    torch.set_num_threads(threads)
+    start = time.perf_counter()
+    classifier = build_classifier(model_name, backend=backend, quantize=quantize)
+    accuracy, avg_time, errors, stats = evaluate_classifier(classifier, INTENTS)
+    return {
+        "model_name": model_name,
+        "accuracy": accuracy,
+        "avg_time": avg_time,
+        "errors": errors,
+        "stats": _plain_stats(stats),
+        "wall_time": time.perf_counter() - start,
+        "peak_rss_mb": peak_memory_mb(),
+    }
 
-            misclass_from_str = ", ".join(
-                f"{source}: {count}" for source, count in values["misclassified_from"].items()
-            ) if values["misclassified_from"] else "None"
+def _init_evaluation_worker(threads):
+    # torch is imported with this module, before any initializer runs, so OMP_NUM_THREADS and
+    # MKL_NUM_THREADS would be read too late: _evaluate_in_process applies the thread budget
+    # with torch.set_num_threads instead
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
 
-            print(f"  {cat:30s} | Accuracy: {cat_accuracy:5.2f}% | Errors: {errors_cat:3d} | Avg Time: {avg_cat_time:6.2f} ms")
-            print(f"      Misclassified to  : {misclass_to_str}")
-            print(f"      Misclassified from: {misclass_from_str}")
+def run_evaluation(models, backend="torch", quantize=False, workers=1, threads_per_worker=None):
+    """
+    Evaluate several models, sequentially or in isolated worker processes
 
-            # Print each example that was misclassified
-            if values["misclassified_examples"]:
-                print(f"      Misclassified examples:")
-                for ex in values["misclassified_examples"]:
-                    print(f"        - \"{ex['text']}\" -> Predicted: {ex['predicted']} (Confidence: {ex['confidence']:.2f})")
+    Args:
+        models (list): SentenceTransformer model names
+        backend (str): Encoder inference backend
+        quantize (bool): Use int8 dynamically quantized encoders
+        workers (int): Number of models evaluated concurrently, 1 evaluates in this process
+        threads_per_worker (int): Torch threads per worker (default: CPU count // workers)
 
-        results.append((model_name, accuracy, avg_time, errors, stats))
+    Returns:
+        list: (model_name, accuracy, avg_time, errors, stats) per model, in input order
+    """
+    results = []
+    start = time.perf_counter()
+
+    if workers <= 1:
+        for model_name in models:
+            print(f"\nEvaluating model: {model_name}")
+            classifier = build_classifier(model_name, backend=backend, quantize=quantize)
+            accuracy, avg_time, errors, stats = evaluate_classifier(classifier, INTENTS)
+            print_report(accuracy, avg_time, errors, stats)
+            results.append((model_name, accuracy, avg_time, errors, stats))
+            # Release the model before loading the next one
+            del classifier
+            gc.collect()
+    else:
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        print(f"Evaluating {len(models)} models with {workers} workers x {threads} threads")
+        context = multiprocessing.get_context("spawn")
+        # One task per process: each model's memory is returned to the system when it finishes
+        with context.Pool(workers, initializer=_init_evaluation_worker, initargs=(threads,), maxtasksperchild=1) as pool:
+            pending = [
+                pool.apply_async(_evaluate_in_process, (model_name, backend, quantize, threads))
+                for model_name in models
+            ]
+            for task in pending:
+                result = task.get()
+                print(f"\nEvaluating model: {result['model_name']} "
+                      f"({result['wall_time']:.1f} s, peak RSS {result['peak_rss_mb']:.0f} MB)")
+                print_report(result["accuracy"], result["avg_time"], result["errors"], result["stats"])
+                results.append((result["model_name"], result["accuracy"], result["avg_time"], result["errors"], result["stats"]))
 
     # Summary Table
     print("\n--- Summary ---")
     for model_name, acc, t, _, _ in results:
         print(f"{model_name:30s} | Accuracy: {acc*100:.2f}% | Avg Time: {t*1000:.2f} ms")
+    print(f"Total wall time: {time.perf_counter() - start:.1f} s")
+
+    return results
+
+def _compare_variant_in_process(model_name, label, kwargs, dataset):
+    """Evaluate one encoder variant in a fresh process so its memory is measured alone"""
+    gc.collect()
+    rss_before = resident_memory_mb()
+    model = load_sentence_model(model_name, **kwargs)
+    rss_loaded = resident_memory_mb()
+    classifier = build_classifier(model_name, model=model, **kwargs)
+    accuracy, avg_time, errors, stats = evaluate_classifier(classifier, dataset)
+    return {
+        "label": label,
+        "accuracy": accuracy,
+        "avg_time": avg_time,
+        "errors": errors,
+        "stats": _plain_stats(stats),
+        "category_errors": {cat: values["errors"] for cat, values in stats.items()},
+        "model_nbytes": model_nbytes(model),
+        "rss_mb": rss_loaded,
+        "rss_delta_mb": rss_loaded - rss_before,
+        "peak_rss_mb": peak_memory_mb(),
+    }
+
+def compare_variants(model_name, variants, dataset):
+    """
+    Evaluate several encoder variants of one model side by side, each in its own process
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        variants (list): (label, build_classifier keyword arguments) pairs, the first one is the reference
+        dataset (dict): Labeled examples per intent
+
+    Returns:
+        list[dict]: One result per variant with accuracy, per-category errors, latency, encoder size and memory
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for label, kwargs in variants:
+        print(f"\nEvaluating {model_name} [{label}]")
+        # A fresh process per variant: memory freed by a previous variant is not always returned
+        # to the system, which would skew the resident memory of the next one
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(_compare_variant_in_process, model_name, label, kwargs, dataset).result()
+        print_report(result["accuracy"], result["avg_time"], result["errors"], result.pop("stats"))
+        results.append(result)
+
+    reference = results[0]
+    reference_errors = {(text, true) for text, true, _, _ in reference["errors"]}
+    print(f"\n--- {model_name}: variant comparison (reference: {reference['label']}) ---")
+    for result in results:
+        delta = (result["accuracy"] - reference["accuracy"]) * 100
+        speedup = reference["avg_time"] / result["avg_time"] if result["avg_time"] > 0 else float("nan")
+        print(
+            f"{result['label']:10s} | Accuracy: {result['accuracy']*100:.2f}% ({delta:+.2f} pts) "
+            f"| Avg Time: {result['avg_time']*1000:.2f} ms (x{speedup:.2f}) "
+            f"| Encoder: {result['model_nbytes'] / 2**20:.1f} MB "
+            f"| RSS: {result['rss_mb']:.0f} MB (+{result['rss_delta_mb']:.0f} MB on load, peak {result['peak_rss_mb']:.0f} MB)"
+        )
+        category_str = ", ".join(f"{cat}: {count}" for cat, count in result["category_errors"].items())
+        print(f"      Errors per category: {category_str}")
+        if result is not reference:
+            new_errors = [(text, true, pred) for text, true, pred, _ in result["errors"] if (text, true) not in reference_errors]
+            print(f"      New errors vs {reference['label']}: {len(new_errors)}")
+            for text, true, pred in new_errors:
+                print(f"        - \"{text}\" ({true}) -> {pred}")
+
+    return results
+
+def latency_stats(latencies_ns):
+    """Summarize per-call latencies (nanoseconds) as milliseconds"""
+    latencies = np.asarray(latencies_ns, dtype=np.float64) / 1e6
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+    }
+
+def benchmark_model(model_name, batch_sizes=(1, 8, 32), thread_counts=(1,), warmup=10, iterations=100,
+                    backend="torch", quantize=False):
+    """
+    Measure IntentClassifier latency and throughput for one model
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        batch_sizes (tuple): Batch sizes to measure, 1 uses classify() and larger ones classify_batch()
+        thread_counts (tuple): Torch intra-op thread counts to measure
+        warmup (int): Untimed iterations before each measurement
+        iterations (int): Timed iterations per (threads, batch size) pair
+        backend (str): Encoder inference backend
+        quantize (bool): Use an int8 dynamically quantized encoder
+
+    Returns:
+        dict: Load time, memory and one latency/throughput entry per configuration
+    """
+    texts = [text for examples in INTENTS.values() for text in examples]
+    rss_before = resident_memory_mb()
+    start = time.perf_counter_ns()
+    classifier = IntentClassifier(
+        model_name=model_name, backend=backend, quantize=quantize,
+        demand_templates=demand_templates, warm_up=False
+    )
+    load_time = (time.perf_counter_ns() - start) / 1e9
+    rss_loaded = resident_memory_mb()
+
+    runs = []
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+        for batch_size in batch_sizes:
+            # Inputs are prepared outside the timed region
+            cycled = texts * (batch_size // len(texts) + 2)
+            batches = [
+                cycled[offset:offset + batch_size]
+                for offset in ((i * batch_size) % len(texts) for i in range(warmup + iterations))
+            ]
+
+            def call(batch):
+                if batch_size == 1:
+                    classifier.classify(batch[0])
+                else:
+                    classifier.classify_batch(batch, batch_size)
+
+            for batch in batches[:warmup]:
+                call(batch)
+
+            latencies = []
+            for batch in batches[warmup:]:
+                begin = time.perf_counter_ns()
+                call(batch)
+                latencies.append(time.perf_counter_ns() - begin)
+
+            total_s = sum(latencies) / 1e9
+            runs.append({
+                "threads": threads,
+                "batch_size": batch_size,
+                **latency_stats(latencies),
+                "throughput": iterations * batch_size / total_s if total_s > 0 else 0.0,
+            })
+            print(
+                f"  threads={threads:<3d} batch={batch_size:<4d} | p50: {runs[-1]['p50_ms']:8.2f} ms "
+                f"| p90: {runs[-1]['p90_ms']:8.2f} ms | p99: {runs[-1]['p99_ms']:8.2f} ms "
+                f"| max: {runs[-1]['max_ms']:8.2f} ms | {runs[-1]['throughput']:8.1f} texts/s"
+            )
+
+    classifier.cleanup()
+    return {
+        "load_time_s": load_time,
+        "rss_delta_mb": rss_loaded - rss_before,
+        "peak_rss_mb": peak_memory_mb(),
+        "runs": runs,
+    }
+
+def _benchmark_in_process(model_name, options):
+    """Run benchmark_model in a fresh process so peak memory is attributed to one model"""
+    return benchmark_model(model_name, **options)
+
+def run_benchmark(models, output=None, **options):
+    """
+    Benchmark several models, each in its own process, and optionally save the results as JSON
+
+    Args:
+        models (list): SentenceTransformer model names
+        output (str): Path of the JSON results file
+        **options: Keyword arguments of benchmark_model()
+
+    Returns:
+        dict: Machine-readable benchmark results
+    """
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "platform": {
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "system": platform.system(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {key: list(value) if isinstance(value, tuple) else value for key, value in options.items()},
+        "models": {},
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for model_name in models:
+        print(f"\nBenchmarking model: {model_name}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            model_results = executor.submit(_benchmark_in_process, model_name, options).result()
+        results["models"][model_name] = model_results
+        print(
+            f"  load: {model_results['load_time_s']:.2f} s | +{model_results['rss_delta_mb']:.0f} MB on load "
+            f"| peak RSS: {model_results['peak_rss_mb']:.0f} MB"
+        )
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    return results
+
+def compare_benchmarks(baseline, current, tolerance=0.10):
+    """
+    Flag regressions of a benchmark run against a saved baseline
+
+    Args:
+        baseline (dict): Baseline results from run_benchmark()
+        current (dict): New results from run_benchmark()
+        tolerance (float): Relative change tolerated before flagging a regression
+
+    Returns:
+        list[str]: Description of each regression
+    """
+    regressions = []
+    for model_name, current_model in current["models"].items():
+        baseline_model = baseline["models"].get(model_name)
+        if baseline_model is None:
+            print(f"{model_name}: no baseline, skipped")
+            continue
+
+        baseline_peak, current_peak = baseline_model["peak_rss_mb"], current_model["peak_rss_mb"]
+        if current_peak > baseline_peak * (1 + tolerance):
+            regressions.append(f"{model_name}: peak RSS {baseline_peak:.0f} -> {current_peak:.0f} MB")
+
+        baseline_runs = {(run["threads"], run["batch_size"]): run for run in baseline_model["runs"]}
+        for run in current_model["runs"]:
+            key = (run["threads"], run["batch_size"])
+            reference = baseline_runs.get(key)
+            if reference is None:
+                continue
+            label = f"{model_name} threads={key[0]} batch={key[1]}"
+            for metric in ("p50_ms", "p90_ms", "p99_ms"):
+                change = run[metric] / reference[metric] - 1 if reference[metric] > 0 else 0.0
+                status = "REGRESSION" if change > tolerance else "ok"
+                print(f"{label:50s} | {metric}: {reference[metric]:8.2f} -> {run[metric]:8.2f} ({change*100:+6.1f}%) {status}")
+                if change > tolerance:
+                    regressions.append(f"{label}: {metric} {reference[metric]:.2f} -> {run[metric]:.2f} ms")
+            change = run["throughput"] / reference["throughput"] - 1 if reference["throughput"] > 0 else 0.0
+            status = "REGRESSION" if change < -tolerance else "ok"
+            print(f"{label:50s} | throughput: {reference['throughput']:8.1f} -> {run['throughput']:8.1f} ({change*100:+6.1f}%) {status}")
+            if change < -tolerance:
+                regressions.append(f"{label}: throughput {reference['throughput']:.1f} -> {run['throughput']:.1f} texts/s")
+
+    return regressions
+
+def score_dataset(model_name, dataset, templates, backend="torch", quantize=False, batch_size=64):
+    """
+    Encode a labeled dataset once and score it against every category
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        dataset (dict): Labeled examples per intent
+        templates (dict): Template phrases per category
+        backend (str): Encoder inference backend
+        quantize (bool): Use an int8 dynamically quantized encoder
+        batch_size (int): Number of sentences per encoder forward pass
+
+    Returns:
+        tuple: Score matrix [num_texts, num_categories], category names, texts and true labels
+    """
+    model = load_sentence_model(model_name, backend=backend, quantize=quantize)
+    category_names = list(templates.keys())
+    centroids = np.stack([
+        np.mean(model.encode(templates[intent], batch_size=batch_size, convert_to_numpy=True), axis=0)
+        for intent in category_names
+    ])
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+
+    texts = [text for examples in dataset.values() for text in examples]
+    labels = [intent for intent, examples in dataset.items() for _ in examples]
+    embeddings = encode_length_bucketed(model, texts, batch_size)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    del model
+    gc.collect()
+    return embeddings @ centroids.T, category_names, texts, labels
+
+def sweep_thresholds(scores, category_names, labels, margins, min_scores):
+    """
+    Evaluate the margin decision rule for every (margin, minimum score) pair at once
+
+    Args:
+        scores (np.ndarray): Score matrix [num_texts, num_categories] from score_dataset()
+        category_names (list): Category names in score column order
+        labels (list): True intent of each text
+        margins (np.ndarray): Margin thresholds to evaluate
+        min_scores (np.ndarray): Minimum top scores to evaluate
+
+    Returns:
+        dict: Grid pairs, accuracy, 'other'-rate and confusion counts per pair
+    """
+    # Label space: the categories plus 'other' if it is not a category itself
+    names = list(category_names) + ([] if "other" in category_names else ["other"])
+    other_id = names.index("other")
+    for label in labels:
+        if label not in names:
+            names.append(label)
+    true_ids = np.array([names.index(label) for label in labels])
+
+    # Top-2 selection, computed once for all pairs
+    top_ids = np.argmax(scores, axis=1)
+    if scores.shape[1] > 1:
+        top_two = np.partition(scores, scores.shape[1] - 2, axis=1)[:, -2:]
+        top_scores, second_scores = top_two.max(axis=1), top_two.min(axis=1)
+    else:
+        top_scores, second_scores = scores[:, 0], np.zeros(len(scores))
+    gaps = top_scores - second_scores
+
+    grid_margins, grid_min_scores = (grid.ravel() for grid in np.meshgrid(margins, min_scores, indexing="ij"))
+
+    # [num_pairs, num_texts] decisions, same rule as IntentClassifier
+    accepted = (gaps[None, :] > grid_margins[:, None]) & (top_scores[None, :] >= grid_min_scores[:, None])
+    predictions = np.where(accepted, top_ids[None, :], other_id)
+
+    num_labels = len(names)
+    num_pairs = len(grid_margins)
+    flat = (np.arange(num_pairs)[:, None] * num_labels + true_ids[None, :]) * num_labels + predictions
+    confusion = np.bincount(flat.ravel(), minlength=num_pairs * num_labels * num_labels)
+
+    return {
+        "labels": names,
+        "margins": grid_margins,
+        "min_scores": grid_min_scores,
+        "accuracy": (predictions == true_ids[None, :]).mean(axis=1),
+        "other_rate": (predictions == other_id).mean(axis=1),
+        "confusion": confusion.reshape(num_pairs, num_labels, num_labels),
+    }
+
+def print_sweep(model_name, sweep, top=10, reference_pairs=()):
+    """Print the best threshold pairs, the reference pairs and the confusion matrix of the best one"""
+    order = np.argsort(-sweep["accuracy"], kind="stable")
+
+    def row(i, note=""):
+        print(
+            f"  margin={sweep['margins'][i]:.3f} min_score={sweep['min_scores'][i]:.3f} "
+            f"| Accuracy: {sweep['accuracy'][i]*100:6.2f}% | Other-rate: {sweep['other_rate'][i]*100:6.2f}% {note}"
+        )
+
+    print(f"\n--- {model_name}: {len(order)} threshold pairs ---")
+    for i in order[:top]:
+        row(i)
+    for margin, min_score, note in reference_pairs:
+        matches = np.flatnonzero(
+            np.isclose(sweep["margins"], margin) & np.isclose(sweep["min_scores"], min_score)
+        )
+        if len(matches):
+            row(matches[0], f"({note})")
+
+    best = order[0]
+    labels = sweep["labels"]
+    confusion = sweep["confusion"][best]
+    print(f"  Confusion for margin={sweep['margins'][best]:.3f} min_score={sweep['min_scores'][best]:.3f} (rows: true, columns: predicted)")
+    print("    " + " " * 30 + " ".join(f"{label[:10]:>10s}" for label in labels))
+    for i, label in enumerate(labels):
+        if confusion[i].sum():
+            print(f"    {label:30s}" + " ".join(f"{count:10d}" for count in confusion[i]))
+
+def run_sweep(models, margins, min_scores, top=10, output=None, backend="torch", quantize=False):
+    results = {}
+    for model_name in models:
+        print(f"\nScoring dataset with model: {model_name}")
+        scores, category_names, _, labels = score_dataset(
+            model_name, INTENTS, demand_templates, backend=backend, quantize=quantize
+        )
+        start = time.perf_counter()
+        sweep = sweep_thresholds(scores, category_names, labels, margins, min_scores)
+        print(f"  {len(sweep['margins'])} threshold pairs evaluated in {(time.perf_counter() - start)*1000:.1f} ms")
+        print_sweep(model_name, sweep, top, reference_pairs=(
+            (0.05, 0.15, "build_classifier"),
+            (0.1, 0.2, "IntentClassifier default"),
+        ))
+        results[model_name] = {
+            "labels": sweep["labels"],
+            "pairs": [
+                {
+                    "margin": float(sweep["margins"][i]),
+                    "min_score": float(sweep["min_scores"][i]),
+                    "accuracy": float(sweep["accuracy"][i]),
+                    "other_rate": float(sweep["other_rate"][i]),
+                    "confusion": sweep["confusion"][i].tolist(),
+                }
+                for i in range(len(sweep["margins"]))
+            ],
+        }
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        print(f"\nResults written to {output}")
+    return results
+
+def evaluate_padding(model_name, dataset, batch_sizes=(8, 32, 64), max_seq_length=None, repeats=3,
+                     backend="torch", quantize=False, seed=0):
+    """
+    Compare padding waste and batched throughput with and without length bucketing
+
+    The dataset is shuffled so that short and long utterances are mixed, like live traffic.
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        dataset (dict): Labeled examples per intent
+        batch_sizes (tuple): Batch sizes to evaluate
+        max_seq_length (int): Optional truncation length
+        repeats (int): Timed classify_batch passes per configuration, the fastest is kept
+        backend (str): Encoder inference backend
+        quantize (bool): Use an int8 dynamically quantized encoder
+        seed (int): Shuffle seed
+
+    Returns:
+        list[dict]: Padding ratios and throughput per batch size
+    """
+    texts = [text for examples in dataset.values() for text in examples]
+    texts = [texts[i] for i in np.random.default_rng(seed).permutation(len(texts))]
+    classifiers = {
+        bucketing: IntentClassifier(
+            model_name, backend=backend, quantize=quantize, demand_templates=demand_templates,
+            max_seq_length=max_seq_length, length_bucketing=bucketing
+        )
+        for bucketing in (False, True)
+    }
+    model = classifiers[True].model
+    lengths = token_lengths(model, texts)
+    by_characters = lengths[np.argsort([-len(text) for text in texts], kind="stable")]
+
+    rows = []
+    for batch_size in batch_sizes:
+        row = {"batch_size": batch_size}
+        for label, ordered in (("input_order", lengths), ("characters", by_characters), ("tokens", np.sort(lengths))):
+            tokens, padded = padding_waste(ordered, batch_size)
+            row[f"waste_{label}"] = padded / (tokens + padded)
+
+        predictions = {}
+        for bucketing, classifier in classifiers.items():
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                predictions[bucketing] = [intent for intent, _ in classifier.classify_batch(texts, batch_size)]
+                times.append(time.perf_counter() - start)
+            row["throughput_bucketed" if bucketing else "throughput_default"] = len(texts) / min(times)
+        row["same_predictions"] = predictions[False] == predictions[True]
+        rows.append(row)
+
+    for classifier in classifiers.values():
+        classifier.cleanup()
+    gc.collect()
+    return rows
+
+def run_padding(models, batch_sizes=(8, 32, 64), max_seq_length=None, output=None, backend="torch", quantize=False):
+    results = {}
+    for model_name in models:
+        print(f"\nEvaluating padding with model: {model_name}")
+        rows = evaluate_padding(
+            model_name, INTENTS, batch_sizes, max_seq_length, backend=backend, quantize=quantize
+        )
+        print(f"\n--- {model_name}: padding waste (share of padded tokens) and classify_batch throughput ---")
+        for row in rows:
+            speedup = row["throughput_bucketed"] / row["throughput_default"]
+            print(
+                f"  batch={row['batch_size']:3d} | Waste: input order {row['waste_input_order']*100:5.1f}% "
+                f"| by characters {row['waste_characters']*100:5.1f}% | by tokens {row['waste_tokens']*100:5.1f}% "
+                f"| Throughput: {row['throughput_default']:.1f} -> {row['throughput_bucketed']:.1f} utterances/s (x{speedup:.2f}) "
+                f"| Same predictions: {row['same_predictions']}"
+            )
+        results[model_name] = rows
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    return results
+
+def evaluate_precision(model_name, dataset, precisions=PRECISIONS, num_categories=10000, repeats=3,
+                       backend="torch", batch_size=32, seed=0):
+    """
+    Compare IntentClassifier precisions: accuracy, score drift, memory and latency
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        dataset (dict): Labeled examples per intent
+        precisions (tuple): Precisions to evaluate, the first one is the reference
+        num_categories (int): Rows of the synthetic matrix used to time scoring at scale, like
+            a large category set or k-NN examples
+        repeats (int): Timed classify_batch passes per precision, the fastest is kept
+        backend (str): Encoder inference backend
+        batch_size (int): Number of sentences per encoder forward pass
+        seed (int): Seed of the synthetic matrix
+
+    Returns:
+        list[dict]: One result per precision
+    """
+    texts = [text for examples in dataset.values() for text in examples]
+    labels = [intent for intent, examples in dataset.items() for _ in examples]
+
+    rows = []
+    reference = None
+    for precision in precisions:
+        gc.collect()
+        rss_before = resident_memory_mb()
+        classifier = IntentClassifier(
+            model_name, margin_threshold=0.05, min_score=0.15, backend=backend,
+            demand_templates=demand_templates, precision=precision
+        )
+        rss_loaded = resident_memory_mb()
+        results = classifier.analyze_batch(texts, batch_size)
+        scores = np.stack([result.scores for result in results])
+        predictions = [result.predicted_intent for result in results]
+        if reference is None:
+            reference = (scores, predictions)
+
+        latencies = []
+        for text in texts:
+            start = time.perf_counter_ns()
+            classifier.classify(text)
+            latencies.append(time.perf_counter_ns() - start)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            classifier.classify_batch(texts, batch_size)
+            times.append(time.perf_counter() - start)
+
+        # Single-query scoring against a large matrix stored like the classifier stores its categories
+        snapshot = classifier.snapshot
+        rng = np.random.default_rng(seed)
+        matrix = rng.normal(size=(num_categories, snapshot.category_matrix.shape[1]))
+        matrix = matrix.astype(scoring_dtype(num_categories, snapshot.dtype))
+        queries = rng.normal(size=(20, matrix.shape[1])).astype(np.float32)
+        dot_scores(queries[:1], matrix)
+        start = time.perf_counter_ns()
+        for query in queries:
+            dot_scores(query[None], matrix)
+        scoring_ns = (time.perf_counter_ns() - start) / len(queries)
+
+        memory = classifier.memory_info()
+        rows.append({
+            "precision": precision,
+            "accuracy": float(np.mean([prediction == label for prediction, label in zip(predictions, labels)])),
+            "agreement": float(np.mean([a == b for a, b in zip(predictions, reference[1])])),
+            "max_score_diff": float(np.abs(scores - reference[0]).max()),
+            "encoder_mb": memory.encoder_bytes / 2**20,
+            "embeddings_kb": memory.embedding_bytes / 2**10,
+            "rss_delta_mb": rss_loaded - rss_before,
+            "latency": latency_stats(latencies),
+            "throughput": len(texts) / min(times),
+            "scoring_ms": scoring_ns / 1e6,
+        })
+        classifier.cleanup()
+        del classifier
+    gc.collect()
+    return rows
+
+def run_precision(models, precisions=PRECISIONS, num_categories=10000, output=None, backend="torch"):
+    results = {}
+    for model_name in models:
+        print(f"\nEvaluating precisions with model: {model_name}")
+        rows = evaluate_precision(model_name, INTENTS, precisions, num_categories, backend=backend)
+        reference = rows[0]
+        print(f"\n--- {model_name}: precision comparison (reference: {reference['precision']}) ---")
+        for row in rows:
+            delta = (row["accuracy"] - reference["accuracy"]) * 100
+            print(
+                f"  {row['precision']:5s} | Accuracy: {row['accuracy']*100:.2f}% ({delta:+.2f} pts) "
+                f"| Agreement: {row['agreement']*100:.1f}% | Max score diff: {row['max_score_diff']:.1e} "
+                f"| Encoder: {row['encoder_mb']:.1f} MB | Embeddings: {row['embeddings_kb']:.1f} KB "
+                f"| RSS: +{row['rss_delta_mb']:.0f} MB on load "
+                f"| p50: {row['latency']['p50_ms']:.2f} ms | Throughput: {row['throughput']:.1f} utterances/s "
+                f"| Scoring {num_categories} rows: {row['scoring_ms']:.2f} ms"
+            )
+        results[model_name] = rows
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    return results
+
+def _centroid_scores(template_embeddings, embeddings, category_names):
+    """Cosine similarity of each embedding with the mean template embedding of each category"""
+    centroids = np.stack([np.mean(template_embeddings[intent], axis=0) for intent in category_names])
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    return (embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)) @ centroids.T
+
+def evaluate_projections(model_name, dataset, templates, dims, methods=("pca", "truncate"),
+                         num_categories=10000, backend="torch", quantize=False, batch_size=64):
+    """
+    Measure accuracy, memory and scoring cost of projected embeddings for several dimensions
+
+    The dataset and templates are encoded once at full width. Each projection is fitted
+    (unsupervised) on the template and dataset embeddings, like projection_fit_texts.
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        dataset (dict): Labeled examples per intent
+        templates (dict): Template phrases per category
+        dims (list): Output dimensions to evaluate
+        methods (tuple): Projection methods, see projection.PROJECTIONS
+        num_categories (int): Size of the synthetic category matrix used to time scoring at scale
+        backend (str): Encoder inference backend
+        quantize (bool): Use an int8 dynamically quantized encoder
+        batch_size (int): Number of sentences per encoder forward pass
+
+    Returns:
+        list[dict]: One row per method and dimension, the first one at full width
+    """
+    model = load_sentence_model(model_name, backend=backend, quantize=quantize)
+    category_names = list(templates.keys())
+    template_embeddings = {
+        intent: model.encode(templates[intent], batch_size=batch_size, convert_to_numpy=True)
+        for intent in category_names
+    }
+    texts = [text for examples in dataset.values() for text in examples]
+    labels = [intent for intent, examples in dataset.items() for _ in examples]
+    embeddings = encode_length_bucketed(model, texts, batch_size)
+    del model
+    gc.collect()
+
+    width = embeddings.shape[1]
+    fit_samples = np.concatenate(list(template_embeddings.values()) + [embeddings])
+    margins = np.round(np.arange(0.0, 0.3001, 0.01), 6)
+    min_scores = np.round(np.arange(0.0, 0.5001, 0.01), 6)
+    rng = np.random.default_rng(0)
+
+    def evaluate(method, dim, project):
+        scores = _centroid_scores(
+            {intent: project(values) for intent, values in template_embeddings.items()},
+            project(embeddings), category_names
+        )
+        default = sweep_thresholds(scores, category_names, labels, [0.05], [0.15])
+        swept = sweep_thresholds(scores, category_names, labels, margins, min_scores)
+        best = int(np.argmax(swept["accuracy"]))
+
+        # Scoring every query against a large category matrix of this width
+        queries = np.ascontiguousarray(project(embeddings), dtype=np.float32)
+        categories = rng.normal(size=(num_categories, queries.shape[1])).astype(np.float32)
+        start = time.perf_counter_ns()
+        queries @ categories.T
+        scoring_ns = (time.perf_counter_ns() - start) / len(queries)
+
+        return {
+            "method": method,
+            "dim": int(queries.shape[1]),
+            "accuracy": float(default["accuracy"][0]),
+            "best_accuracy": float(swept["accuracy"][best]),
+            "best_margin": float(swept["margins"][best]),
+            "best_min_score": float(swept["min_scores"][best]),
+            "bytes_per_embedding": int(queries.shape[1] * 4),
+            "scoring_us": scoring_ns / 1000,
+        }
+
+    rows = [evaluate("none", width, lambda values: values)]
+    for method in methods:
+        for dim in dims:
+            if dim >= width:
+                continue
+            projection = EmbeddingProjection(method, dim).fit(fit_samples)
+            rows.append(evaluate(method, dim, projection.transform))
+    return rows
+
+def run_projection(models, dims, methods=("pca", "truncate"), num_categories=10000, output=None,
+                   backend="torch", quantize=False):
+    results = {}
+    for model_name in models:
+        print(f"\nEvaluating projections with model: {model_name}")
+        rows = evaluate_projections(
+            model_name, INTENTS, demand_templates, dims, methods, num_categories, backend=backend, quantize=quantize
+        )
+        reference = rows[0]
+        print(f"\n--- {model_name}: accuracy vs dimension (scoring against {num_categories} categories) ---")
+        for row in rows:
+            delta = (row["accuracy"] - reference["accuracy"]) * 100
+            print(
+                f"  {row['method']:8s} dim={row['dim']:4d} | Accuracy: {row['accuracy']*100:6.2f}% ({delta:+.2f} pts) "
+                f"| Best: {row['best_accuracy']*100:6.2f}% (margin={row['best_margin']:.2f} min_score={row['best_min_score']:.2f}) "
+                f"| {row['bytes_per_embedding']} B/embedding | Scoring: {row['scoring_us']:.1f} us/query"
+            )
+        results[model_name] = rows
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    return results
+
+def _lexical_predictions(texts, labels, templates, features="tfidf", folds=0):
+    """
+    Predict every text with the lexical cascade
+
+    Args:
+        texts (list): Dataset utterances
+        labels (list): True intent of each utterance
+        templates (dict): Template phrases per category
+        features (str): Lexical features, 'tfidf' or 'hashing'
+        folds (int): When above 1, the dataset is also used as training data with k-fold cross-validation
+
+    Returns:
+        tuple: Predicted intents, probability gap between the two best categories, mean latency per utterance (s)
+    """
+    predictions = np.empty(len(texts), dtype=object)
+    gaps = np.zeros(len(texts))
+    latencies = []
+    fold_ids = np.arange(len(texts)) % folds if folds > 1 else np.zeros(len(texts), dtype=int)
+    for fold in np.unique(fold_ids):
+        extra = defaultdict(list)
+        for i in np.flatnonzero(fold_ids != fold):
+            extra[labels[i]].append(texts[i])
+        cascade = LexicalCascade(margin=0.0, features=features).fit(templates, extra)
+        held_out = np.flatnonzero(fold_ids == fold)
+        intents, top, _, probabilities = cascade.predict([texts[i] for i in held_out])
+        second = np.sort(probabilities, axis=1)[:, -2]
+        predictions[held_out] = intents
+        gaps[held_out] = top - second
+        for i in held_out[:50]:
+            # Single-utterance latency, like classify()
+            start = time.perf_counter_ns()
+            cascade.predict([texts[i]])
+            latencies.append(time.perf_counter_ns() - start)
+    return predictions, gaps, np.mean(latencies) / 1e9
+
+def evaluate_cascade(model_name, dataset, templates, margins, features="tfidf", folds=5,
+                     backend="torch", quantize=False):
+    """
+    Measure the hit rate and accuracy delta of the lexical cascade in front of the encoder
+
+    The encoder and lexical predictions are computed once, then every margin is
+    evaluated: answered utterances take the lexical prediction, the others the
+    encoder prediction.
+
+    Args:
+        model_name (str): Name of the SentenceTransformer model
+        dataset (dict): Labeled examples per intent
+        templates (dict): Template phrases per category
+        margins (list): Lexical probability gaps to evaluate
+        features (str): Lexical features, 'tfidf' or 'hashing'
+        folds (int): Cross-validation folds when the dataset is added to the lexical training data
+        backend (str): Encoder inference backend
+        quantize (bool): Use an int8 dynamically quantized encoder
+
+    Returns:
+        dict: Encoder accuracy and latency, and one row per training setting and margin
+    """
+    texts = [text for examples in dataset.values() for text in examples]
+    labels = np.array([intent for intent, examples in dataset.items() for _ in examples], dtype=object)
+
+    classifier = IntentClassifier(
+        model_name, margin_threshold=0.05, min_score=0.15, backend=backend, quantize=quantize,
+        demand_templates=templates
+    )
+    encoder_predictions = np.empty(len(texts), dtype=object)
+    start = time.perf_counter()
+    for i, text in enumerate(texts):
+        encoder_predictions[i] = classifier.classify(text)[0]
+    encoder_time = (time.perf_counter() - start) / len(texts)
+    encoder_accuracy = float(np.mean(encoder_predictions == labels))
+    classifier.cleanup()
+    del classifier
+    gc.collect()
+
+    rows = []
+    settings = [("templates", 0)] + ([(f"templates+dataset ({folds}-fold)", folds)] if folds > 1 else [])
+    for training, setting_folds in settings:
+        lexical_predictions, gaps, lexical_time = _lexical_predictions(
+            texts, list(labels), templates, features, setting_folds
+        )
+        for margin in margins:
+            hits = gaps >= margin
+            predictions = np.where(hits, lexical_predictions, encoder_predictions)
+            accuracy = float(np.mean(predictions == labels))
+            rows.append({
+                "training": training,
+                "margin": float(margin),
+                "hit_rate": float(hits.mean()),
+                "hit_accuracy": float(np.mean(lexical_predictions[hits] == labels[hits])) if hits.any() else None,
+                "accuracy": accuracy,
+                "accuracy_delta": accuracy - encoder_accuracy,
+                # Every utterance pays the lexical stage, only misses pay the encoder
+                "avg_time": lexical_time + (1 - hits.mean()) * encoder_time,
+            })
+
+    return {"encoder_accuracy": encoder_accuracy, "encoder_time": encoder_time, "rows": rows}
+
+def run_cascade(models, margins, features="tfidf", folds=5, output=None, backend="torch", quantize=False):
+    results = {}
+    for model_name in models:
+        print(f"\nEvaluating lexical cascade with model: {model_name}")
+        result = evaluate_cascade(
+            model_name, INTENTS, demand_templates, margins, features, folds, backend=backend, quantize=quantize
+        )
+        print(f"\n--- {model_name}: encoder only | Accuracy: {result['encoder_accuracy']*100:.2f}% | Avg Time: {result['encoder_time']*1000:.2f} ms ---")
+        for row in result["rows"]:
+            hit_accuracy = f"{row['hit_accuracy']*100:6.2f}%" if row["hit_accuracy"] is not None else "   n/a "
+            print(
+                f"  {row['training']:28s} margin={row['margin']:.2f} | Hit rate: {row['hit_rate']*100:6.2f}% "
+                f"| Hit accuracy: {hit_accuracy} | Accuracy: {row['accuracy']*100:6.2f}% ({row['accuracy_delta']*100:+.2f} pts) "
+                f"| Avg Time: {row['avg_time']*1000:.2f} ms"
+            )
+        results[model_name] = result
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    return results
+
+def synthetic_categories(num_categories, dim=384, num_queries=500, topics=None, spread=1.0, noise=0.8, seed=0):
+    """
+    Generate clustered unit vectors standing in for a large set of category embeddings
+
+    Real category sets only hold a handful of intents, so thousands of fine-grained
+    intents are simulated: categories are scattered around shared topics and each
+    query is a noisy copy of a random category.
+
+    Args:
+        num_categories (int): Number of category vectors
+        dim (int): Embedding dimension
+        num_queries (int): Number of query vectors
+        topics (int): Number of topic clusters (default: sqrt(num_categories))
+        spread (float): Distance of the categories to their topic
+        noise (float): Distance of the queries to their category
+        seed (int): Random seed
+
+    Returns:
+        tuple: Category names, category matrix [num_categories, dim] and queries [num_queries, dim]
+    """
+    rng = np.random.default_rng(seed)
+    topics = topics or max(1, int(np.sqrt(num_categories)))
+    centers = rng.normal(size=(topics, dim))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    categories = centers[rng.integers(0, topics, num_categories)] + rng.normal(scale=spread / np.sqrt(dim), size=(num_categories, dim))
+    categories /= np.linalg.norm(categories, axis=1, keepdims=True)
+    queries = categories[rng.integers(0, num_categories, num_queries)] + rng.normal(scale=noise / np.sqrt(dim), size=(num_queries, dim))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    names = [f"intent_{i}" for i in range(num_categories)]
+    return names, categories.astype(np.float32), queries.astype(np.float32)
+
+def benchmark_index(index, queries, reference, k=5, updates=20):
+    """
+    Measure the recall and latency of a built index against exact search results
+
+    Args:
+        index: Built index from vector_index.make_index()
+        queries (np.ndarray): Query matrix [num_queries, dim]
+        reference (np.ndarray): Exact top-k names [num_queries, k]
+        k (int): Number of results per query
+        updates (int): Number of categories removed and re-inserted to time incremental updates
+
+    Returns:
+        dict: Recall@1, recall@k, single-query latency and update latency
+    """
+    latencies = []
+    found = np.empty(reference.shape, dtype=object)
+    for row, query in enumerate(queries):
+        # One query at a time, like classify()
+        start = time.perf_counter_ns()
+        names, _ = index.search(query[None], k)
+        latencies.append(time.perf_counter_ns() - start)
+        found[row] = names[0]
+
+    recall_at_k = np.mean([len(set(found[row]) & set(reference[row])) / k for row in range(len(reference))])
+    removed = list(reference[:updates, 0])
+    update_ns = []
+    for name, query in zip(removed, queries[:updates]):
+        start = time.perf_counter_ns()
+        index.with_removed([name]).with_added([name], query[None])
+        update_ns.append(time.perf_counter_ns() - start)
+
+    return {
+        "recall_at_1": float(np.mean(found[:, 0] == reference[:, 0])),
+        f"recall_at_{k}": float(recall_at_k),
+        "latency": latency_stats(latencies),
+        "update_ms": float(np.mean(update_ns) / 1e6) if update_ns else 0.0,
+    }
+
+def run_index_benchmark(sizes=(1000, 10000), kinds=("ivf",), nprobes=(1, 2, 4, 8, 16), dim=384,
+                        num_queries=500, k=5, nlist=None, output=None):
+    """
+    Compare approximate category indexes with exact search: recall versus query latency
+
+    Args:
+        sizes (tuple): Numbers of categories to index
+        kinds (tuple): Approximate index types, see vector_index.INDEX_TYPES
+        nprobes (tuple): Numbers of clusters scanned per query
+        dim (int): Embedding dimension
+        num_queries (int): Number of timed queries
+        k (int): Number of results per query
+        nlist (int): Number of clusters (default: about sqrt(num_categories))
+        output (str): Optional JSON file receiving the results
+
+    Returns:
+        dict: Results per number of categories
+    """
+    results = {}
+    for size in sizes:
+        names, categories, queries = synthetic_categories(size, dim, num_queries)
+        print(f"\n--- {size} categories, {dim} dimensions, {num_queries} single queries ---")
+
+        start = time.perf_counter()
+        exact = make_index("exact").with_added(names, categories)
+        build_ms = (time.perf_counter() - start) * 1000
+        reference, _ = exact.search(queries, k)
+        rows = [{"index": "exact", "nprobe": None, "build_ms": build_ms, **benchmark_index(exact, queries, reference, k)}]
+
+        for kind in kinds:
+            for nprobe in nprobes:
+                try:
+                    start = time.perf_counter()
+                    index = make_index(kind, nlist, nprobe).with_added(names, categories)
+                    build_ms = (time.perf_counter() - start) * 1000
+                except ImportError as e:
+                    print(f"  Skipping {kind}: {e}")
+                    break
+                rows.append({"index": kind, "nprobe": nprobe, "build_ms": build_ms, **benchmark_index(index, queries, reference, k)})
+
+        for row in rows:
+            print(
+                f"  {row['index']:5s} nprobe={str(row['nprobe']):>4s} | Recall@1: {row['recall_at_1']*100:6.2f}% "
+                f"| Recall@{k}: {row[f'recall_at_{k}']*100:6.2f}% | p50: {row['latency']['p50_ms']:.3f} ms "
+                f"| p99: {row['latency']['p99_ms']:.3f} ms | Update: {row['update_ms']:.2f} ms | Build: {row['build_ms']:.0f} ms"
+            )
+        results[str(size)] = rows
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {output}")
+    return results
+
+def parse_args(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--models", nargs="+", default=MODELS, help="SentenceTransformer models to evaluate")
+    common.add_argument("--backend", choices=BACKENDS, default="torch", help="Encoder inference backend")
+    common.add_argument("--quantize", action="store_true", help="Use int8 dynamically quantized encoders")
+
+    parser = argparse.ArgumentParser(description="Evaluate intent classification models")
+    subparsers = parser.add_subparsers(dest="command")
+    evaluate = subparsers.add_parser("evaluate", parents=[common], help="Evaluate each model (default)")
+    evaluate.add_argument("--workers", type=int, default=1, help="Models evaluated concurrently in isolated processes")
+    evaluate.add_argument("--threads-per-worker", type=int, default=None, help="Torch threads per worker process")
+    subparsers.add_parser("quantization", parents=[common], help="Compare fp32 and int8 dynamically quantized encoders")
+
+    benchmark = subparsers.add_parser("benchmark", parents=[common], help="Measure latency percentiles and throughput")
+    benchmark.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32], help="Batch sizes to measure")
+    benchmark.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Torch thread counts to measure")
+    benchmark.add_argument("--warmup", type=int, default=10, help="Untimed iterations before each measurement")
+    benchmark.add_argument("--iterations", type=int, default=100, help="Timed iterations per configuration")
+    benchmark.add_argument("--output", help="Write results to this JSON file")
+
+    sweep = subparsers.add_parser("sweep", parents=[common], help="Grid-search margin and minimum score thresholds")
+    sweep.add_argument("--margin-range", type=float, nargs=3, default=[0.0, 0.3, 0.01], metavar=("START", "STOP", "STEP"), help="Margin thresholds to evaluate")
+    sweep.add_argument("--min-score-range", type=float, nargs=3, default=[0.0, 0.5, 0.01], metavar=("START", "STOP", "STEP"), help="Minimum scores to evaluate")
+    sweep.add_argument("--top", type=int, default=10, help="Number of best pairs to print")
+    sweep.add_argument("--output", help="Write every pair's results to this JSON file")
+
+    padding = subparsers.add_parser("padding", parents=[common], help="Measure padding waste and length-bucketed batching")
+    padding.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64], help="Batch sizes to measure")
+    padding.add_argument("--max-seq-length", type=int, default=None, help="Truncate inputs to this many tokens")
+    padding.add_argument("--output", help="Write results to this JSON file")
+
+    precision = subparsers.add_parser("precision", parents=[common], help="Compare accuracy, memory and latency of reduced precisions")
+    precision.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS), help="Precisions to compare, the first one is the reference")
+    precision.add_argument("--categories", type=int, default=10000, help="Matrix size used to time scoring at scale")
+    precision.add_argument("--output", help="Write results to this JSON file")
+
+    projection = subparsers.add_parser("projection", parents=[common], help="Report accuracy versus embedding dimension")
+    projection.add_argument("--dims", type=int, nargs="+", default=[32, 64, 128, 256], help="Projected dimensions to evaluate")
+    projection.add_argument("--methods", nargs="+", choices=PROJECTIONS, default=list(PROJECTIONS), help="Projection methods")
+    projection.add_argument("--categories", type=int, default=10000, help="Category matrix size used to time scoring")
+    projection.add_argument("--output", help="Write results to this JSON file")
+
+    cascade = subparsers.add_parser("cascade", parents=[common], help="Measure hit rate and accuracy delta of the lexical cascade")
+    cascade.add_argument("--margins", type=float, nargs="+", default=[0.2, 0.3, 0.4, 0.5, 0.6, 0.7], help="Lexical probability gaps to evaluate")
+    cascade.add_argument("--features", choices=LEXICAL_FEATURES, default="tfidf", help="Lexical features")
+    cascade.add_argument("--folds", type=int, default=5, help="Cross-validation folds when training on the dataset too (0 disables)")
+    cascade.add_argument("--output", help="Write results to this JSON file")
+
+    index = subparsers.add_parser("index", help="Measure recall and latency of approximate category indexes")
+    index.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Numbers of categories to index")
+    index.add_argument("--indexes", nargs="+", choices=[kind for kind in INDEX_TYPES if kind != "exact"], default=["ivf"], help="Approximate indexes compared with exact search")
+    index.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Clusters scanned per query")
+    index.add_argument("--nlist", type=int, default=None, help="Number of clusters (default: about sqrt(categories))")
+    index.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    index.add_argument("--queries", type=int, default=500, help="Number of timed queries")
+    index.add_argument("--k", type=int, default=5, help="Results per query")
+    index.add_argument("--output", help="Write results to this JSON file")
+
+    compare = subparsers.add_parser("compare", help="Compare benchmark results against a baseline")
+    compare.add_argument("baseline", help="Baseline JSON results")
+    compare.add_argument("current", help="New JSON results")
+    compare.add_argument("--tolerance", type=float, default=0.10, help="Relative change tolerated before flagging a regression")
+
+    # Plain 'python metrics.py [options]' runs the evaluation
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv = ["evaluate"] + argv
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.command == "benchmark":
+        run_benchmark(
+            args.models, output=args.output,
+            batch_sizes=tuple(args.batch_sizes), thread_counts=tuple(dict.fromkeys(args.threads)),
+            warmup=args.warmup, iterations=args.iterations,
+            backend=args.backend, quantize=args.quantize
+        )
+    elif args.command == "sweep":
+        # Inclusive ranges, rounded so reference values such as 0.05 match exactly
+        margins = np.round(np.arange(args.margin_range[0], args.margin_range[1] + args.margin_range[2] / 2, args.margin_range[2]), 6)
+        min_scores = np.round(np.arange(args.min_score_range[0], args.min_score_range[1] + args.min_score_range[2] / 2, args.min_score_range[2]), 6)
+        run_sweep(
+            args.models, margins, min_scores, top=args.top, output=args.output,
+            backend=args.backend, quantize=args.quantize
+        )
+    elif args.command == "padding":
+        run_padding(
+            args.models, tuple(args.batch_sizes), args.max_seq_length, output=args.output,
+            backend=args.backend, quantize=args.quantize
+        )
+    elif args.command == "precision":
+        run_precision(args.models, tuple(args.precisions), args.categories, output=args.output, backend=args.backend)
+    elif args.command == "projection":
+        run_projection(
+            args.models, args.dims, methods=tuple(args.methods), num_categories=args.categories,
+            output=args.output, backend=args.backend, quantize=args.quantize
+        )
+    elif args.command == "cascade":
+        run_cascade(
+            args.models, args.margins, features=args.features, folds=args.folds, output=args.output,
+            backend=args.backend, quantize=args.quantize
+        )
+    elif args.command == "index":
+        run_index_benchmark(
+            args.sizes, kinds=tuple(args.indexes), nprobes=tuple(args.nprobe), dim=args.dim,
+            num_queries=args.queries, k=args.k, nlist=args.nlist, output=args.output
+        )
+    elif args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare_benchmarks(baseline, current, args.tolerance)
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance*100:.0f}%")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1 if regressions else 0)
+    elif args.command == "quantization":
+        for model_name in args.models:
+            compare_variants(model_name, [
+                ("fp32", {"backend": args.backend}),
+                ("int8", {"backend": args.backend, "quantize": True}),
+            ], INTENTS)
+    else:
+        run_evaluation(
+            args.models, backend=args.backend, quantize=args.quantize,
+            workers=args.workers, threads_per_worker=args.threads_per_worker
+        )
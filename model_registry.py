@@ -0,0 +1,147 @@
+from collections import namedtuple
+import ctypes
+import gc
+import sys
+import threading
+
+
+RegistryInfo = namedtuple("RegistryInfo", ["references", "nbytes"])
+ReleaseInfo = namedtuple("ReleaseInfo", ["references", "freed_bytes"])
+
+
+def model_nbytes(model):
+    """
+    Return the memory held by the weights and buffers of a torch encoder
+
+    Args:
+        model (SentenceTransformer): The encoder
+
+    Returns:
+        int: Size in bytes, 0 when the weights live outside PyTorch (ONNX Runtime)
+    """
+    # Keyed by identity so that tied weights are counted once
+    tensors = {id(tensor): tensor for tensor in [*model.parameters(), *model.buffers()]}
+    for value in model.state_dict().values():
+        # Dynamically quantized linear layers keep their int8 weight and bias in a packed tuple
+        if isinstance(value, tuple):
+            tensors.update((id(tensor), tensor) for tensor in value if hasattr(tensor, "element_size"))
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors.values())
+
+
+def _trim_heap():
+    """Return freed heap pages to the operating system where the C library allows it"""
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        # Not glibc (e.g. musl)
+        pass
+
+
+class _Entry:
+    """One shared encoder, its users and the lock serializing its tokenizer calls"""
+
+    def __init__(self):
+        self.model = None
+        self.references = 0
+        self.load_lock = threading.Lock()
+        # Fast tokenizers are not safe to call from several threads at once, whichever classifier calls
+        self.encode_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide, reference-counted store of loaded encoders
+
+    Classifiers using the same encoder variant share one copy of its weights.
+    The encoder is loaded by its first user and dropped when its last user
+    releases it.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, loader):
+        """
+        Take a reference on an encoder, loading it on first use
+
+        Args:
+            key (str): Identifier of the encoder variant, see IntentClassifier.model_key
+            loader (callable): Returns the loaded encoder, only called when none is loaded for the key
+
+        Returns:
+            tuple: The shared encoder and the lock every caller must hold while tokenizing
+        """
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.references += 1
+
+        # Loads of other keys are not blocked while this one runs
+        with entry.load_lock:
+            if entry.model is None:
+                try:
+                    entry.model = loader()
+                except Exception:
+                    self._drop(key, entry)
+                    raise
+            else:
+                print(f"♻️ Reusing loaded model {key}")
+        return entry.model, entry.encode_lock
+
+    def release(self, key):
+        """
+        Drop a reference on an encoder, freeing it when it was the last one
+
+        Args:
+            key (str): Identifier passed to acquire()
+
+        Returns:
+            ReleaseInfo: Remaining references and bytes of weights freed (0 while still in use)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise KeyError(f"Model {key} is not in the registry")
+            entry.references -= 1
+            if entry.references > 0:
+                return ReleaseInfo(entry.references, 0)
+            del self._entries[key]
+
+        model, entry.model = entry.model, None
+        freed = model_nbytes(model) if model is not None else 0
+        device = getattr(model, "device", None)
+        del model
+        gc.collect()
+        if device is not None and device.type == "cuda":
+            import torch
+
+            torch.cuda.empty_cache()
+        _trim_heap()
+        return ReleaseInfo(0, freed)
+
+    def _drop(self, key, entry):
+        """Undo the reference of a failed load"""
+        with self._lock:
+            entry.references -= 1
+            if entry.references == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def info(self):
+        """
+        Return the loaded encoders
+
+        Returns:
+            dict: RegistryInfo (references, bytes of weights) by key
+        """
+        with self._lock:
+            entries = dict(self._entries)
+        return {
+            key: RegistryInfo(entry.references, model_nbytes(entry.model) if entry.model is not None else 0)
+            for key, entry in entries.items()
+        }
+
+
+# Shared by every classifier of the process unless one is given its own registry
+registry = ModelRegistry()
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+PROJECTIONS = ("pca", "truncate")
+# Output dimension when none is given, PCA uses fewer when fitted on fewer embeddings
+DEFAULT_PROJECTION_DIM = 128
+
+
+class EmbeddingProjection:
+    """
+    Linear map from full-width encoder embeddings to a smaller dimension
+
+    'pca' centers the embeddings and projects them on their principal axes.
+    'truncate' keeps the coordinates with the highest variance, a plain gather
+    with no matrix product. Both are fitted on sample embeddings, then fixed.
+    """
+
+    def __init__(self, method="pca", dim=None):
+        """
+        Args:
+            method (str): 'pca' or 'truncate'
+            dim (int): Output dimension, None picks DEFAULT_PROJECTION_DIM or, for PCA,
+                the number of fitted embeddings if smaller
+        """
+        if method not in PROJECTIONS:
+            raise ValueError(f"Unknown projection '{method}', expected one of {PROJECTIONS}")
+        if dim is not None and dim < 1:
+            raise ValueError("Projection dimension must be at least 1")
+
+        self.method = method
+        self.dim = dim
+        self.mean = None
+        self.components = None
+        self.columns = None
+
+    @property
+    def is_fitted(self):
+        """bool: True once the projection can transform embeddings"""
+        return self.components is not None or self.columns is not None
+
+    @property
+    def key(self):
+        """str: Identifier of the projection, used to key cached embeddings"""
+        return f"{self.method}{self.dim}"
+
+    def fit(self, embeddings):
+        """
+        Fit the projection on sample embeddings
+
+        PCA yields at most one axis per sample, so it needs at least dim samples.
+
+        Args:
+            embeddings (np.ndarray): Sample embeddings of shape [num_samples, width]
+
+        Returns:
+            EmbeddingProjection: self
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        if self.dim is None:
+            supported = embeddings.shape[1] if self.method == "truncate" else min(embeddings.shape)
+            self.dim = min(DEFAULT_PROJECTION_DIM, supported)
+        if self.dim > embeddings.shape[1]:
+            raise ValueError(f"Cannot project {embeddings.shape[1]}-dimensional embeddings to {self.dim} dimensions")
+        if self.method == "pca" and self.dim > len(embeddings):
+            raise ValueError(
+                f"PCA to {self.dim} dimensions needs at least {self.dim} embeddings, got {len(embeddings)}: "
+                f"fit it on more embeddings (projection_fit_texts) or lower the dimension (projection_dim)"
+            )
+
+        if self.method == "truncate":
+            variance = embeddings.var(axis=0)
+            self.columns = np.sort(np.argsort(-variance, kind="stable")[:self.dim])
+            return self
+
+        self.mean = embeddings.mean(axis=0).astype(np.float32)
+        _, _, vt = np.linalg.svd(embeddings - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:self.dim].T, dtype=np.float32)
+        return self
+
+    def transform(self, embeddings):
+        """
+        Project embeddings
+
+        Args:
+            embeddings (np.ndarray): Embeddings of shape [num_texts, width]
+
+        Returns:
+            np.ndarray: Projected embeddings of shape [num_texts, dim]
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.method == "truncate":
+            return np.ascontiguousarray(embeddings[:, self.columns])
+        return (embeddings - self.mean) @ self.components
+
+    def export_state(self):
+        """Return the fitted parameters as plain picklable data"""
+        return {
+            "method": self.method,
+            "dim": self.dim,
+            "mean": self.mean,
+            "components": self.components,
+            "columns": self.columns
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a fitted projection from export_state()"""
+        projection = cls(state["method"], state["dim"])
+        projection.mean = state["mean"]
+        projection.components = state["components"]
+        projection.columns = state["columns"]
+        return projection
@@ -0,0 +1,93 @@
+import csv
+import itertools
+import json
+
+
+INPUT_FORMATS = ("text", "jsonl", "csv")
+
+
+def iter_utterances(stream, input_format="text", text_field="text", id_field="id"):
+    """
+    Read utterances lazily from a text stream
+
+    Args:
+        stream (file): Open text stream (a file or sys.stdin)
+        input_format (str): 'text' (one utterance per line), 'jsonl' or 'csv' (with a header row)
+        text_field (str): Field holding the utterance in JSONL objects and CSV rows
+        id_field (str): Optional field copied to the output to identify each record
+
+    Yields:
+        tuple[str, object]: The utterance and its identifier (None when absent)
+
+    Raises:
+        ValueError: A JSONL line is not valid JSON or not a JSON object
+    """
+    if input_format == "text":
+        for line in stream:
+            yield line.rstrip("\r\n"), None
+    elif input_format == "jsonl":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_number}: expected a JSON object, got {type(record).__name__}")
+            yield record.get(text_field) or "", record.get(id_field)
+    elif input_format == "csv":
+        for row in csv.DictReader(stream):
+            yield row.get(text_field) or "", row.get(id_field)
+    else:
+        raise ValueError(f"Unknown input format '{input_format}', expected one of {INPUT_FORMATS}")
+
+
+def classify_stream(classifier, utterances, chunk_size=256, batch_size=32, all_scores=False):
+    """
+    Classify a stream of utterances in fixed-size chunks
+
+    Only one chunk is held in memory at a time, whatever the size of the input.
+
+    Args:
+        classifier (IntentClassifier): The classifier to use
+        utterances (iterable): (text, identifier) pairs, see iter_utterances()
+        chunk_size (int): Number of utterances classified together
+        batch_size (int): Number of sentences per encoder forward pass
+        all_scores (bool): Include the similarity with every category
+
+    Yields:
+        dict: One JSON-serializable record per utterance, in input order
+    """
+    iterator = iter(utterances)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            break
+
+        results = classifier.analyze_batch([text for text, _ in chunk], batch_size)
+        for (text, identifier), result in zip(chunk, results):
+            record = {"text": text, "intent": result.predicted_intent, "confidence": result.confidence}
+            if identifier is not None:
+                record = {"id": identifier, **record}
+            if all_scores:
+                record["all_scores"] = result.all_scores
+            yield record
+
+
+def write_jsonl(records, stream):
+    """
+    Write records incrementally as JSON lines
+
+    Args:
+        records (iterable): JSON-serializable records
+        stream (file): Output text stream
+
+    Returns:
+        int: Number of records written
+    """
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+        if count % 256 == 0:
+            stream.flush()
+    stream.flush()
+    return count
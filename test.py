@@ -1,9 +1,59 @@
+import argparse
+import contextlib
+import sys
+
 from intent_classifier import IntentClassifier
+from stream_classifier import INPUT_FORMATS, classify_stream, iter_utterances, write_jsonl
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Interactive or streaming intent classification")
+    parser.add_argument("--model", default="all-MiniLM-L12-v2", help="SentenceTransformer model to use")
+    parser.add_argument("--input", help="Classify utterances from this file ('-' for stdin) instead of the interactive prompt")
+    parser.add_argument("--output", default="-", help="JSONL output file ('-' for stdout)")
+    parser.add_argument("--format", choices=INPUT_FORMATS, default="text", help="Input format")
+    parser.add_argument("--field", default="text", help="Text field of JSONL objects or CSV columns")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Utterances classified together")
+    parser.add_argument("--batch-size", type=int, default=32, help="Sentences per encoder forward pass")
+    parser.add_argument("--all-scores", action="store_true", help="Include the similarity with every category")
+    return parser.parse_args()
+
+
+def run_stream(args):
+    """Classify a file or stdin and write JSONL results incrementally"""
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    try:
+        # Status messages go to stderr so stdout only carries JSONL
+        with contextlib.redirect_stdout(sys.stderr):
+            classifier = IntentClassifier(model_name=args.model)
+            records = classify_stream(
+                classifier,
+                iter_utterances(source, args.format, args.field),
+                chunk_size=args.chunk_size,
+                batch_size=args.batch_size,
+                all_scores=args.all_scores
+            )
+            count = write_jsonl(records, output)
+            print(f"✅ {count} utterances classified")
+            classifier.cleanup()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.input:
+        run_stream(args)
+        sys.exit(0)
+    
     # Initialize the classifier
     print("🚀 Initializing Intent Classifier...")
-    classifier = IntentClassifier()
+    # The model loads in the background while the prompt is already available
+    classifier = IntentClassifier(model_name=args.model, background_loading=True)
     
     print("💬 Intent Classification System Ready!")
     print("Available commands: 'exit', 'quit', 'q' to stop, 'help' for more options")
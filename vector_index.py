@@ -0,0 +1,473 @@
+import math
+
+import numpy as np
+
+
+INDEX_TYPES = ("exact", "ivf", "faiss")
+# The IVF index scans everything until it holds enough vectors to train on
+IVF_MIN_TRAIN_SIZE = 256
+
+
+def make_index(kind, nlist=None, nprobe=8):
+    """
+    Create an empty nearest-neighbor index over L2-normalized vectors
+
+    Args:
+        kind (str): 'exact', 'ivf' (pure NumPy inverted file) or 'faiss' (requires faiss-cpu)
+        nlist (int): Number of IVF clusters, about sqrt(num_vectors) when None
+        nprobe (int): Number of IVF clusters scanned per query
+
+    Returns:
+        ExactIndex | IVFIndex | FaissIndex: The empty index
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index '{kind}', expected one of {INDEX_TYPES}")
+    if nprobe < 1:
+        raise ValueError("nprobe must be at least 1")
+    if nlist is not None and nlist < 1:
+        raise ValueError("nlist must be at least 1")
+
+    if kind == "exact":
+        return ExactIndex()
+    if kind == "ivf":
+        return IVFIndex(nlist, nprobe)
+    return FaissIndex(nlist, nprobe)
+
+
+def top_k(scores, k):
+    """
+    Select the k largest scores of each row, in descending order
+
+    Args:
+        scores (np.ndarray): Score matrix of shape [num_queries, num_items]
+        k (int): Number of columns to keep, clipped to num_items
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Column indices and scores, shape [num_queries, min(k, num_items)]
+    """
+    k = min(k, scores.shape[1])
+    rows = np.arange(scores.shape[0])[:, None]
+    if k < scores.shape[1]:
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-scores[rows, columns], axis=1, kind="stable")
+    columns = columns[rows, order]
+    return columns, scores[rows, columns]
+
+
+def _empty_results(num_queries, k):
+    """Results padded with None names and -inf scores"""
+    return np.full((num_queries, k), None, dtype=object), np.full((num_queries, k), -np.inf, dtype=np.float32)
+
+
+def _as_names(names):
+    return np.array(list(names), dtype=object)
+
+
+def _as_matrix(vectors):
+    return np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
+
+
+class ExactIndex:
+    """
+    Brute-force inner product index, the reference for the approximate indexes
+
+    Like every index here it is copy-on-write: with_added() and with_removed()
+    return a new index, so a published index can be searched without locking.
+    """
+
+    def __init__(self, names=None, matrix=None):
+        self._names = np.empty(0, dtype=object) if names is None else names
+        self._matrix = matrix
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return bool(np.any(self._names == name)) if len(self._names) else False
+
+    def with_added(self, names, vectors):
+        """
+        Return a copy holding extra vectors
+
+        Args:
+            names (list): Item names, one per vector
+            vectors (np.ndarray): L2-normalized vectors of shape [num_items, dim]
+
+        Returns:
+            ExactIndex: The new index
+        """
+        vectors = _as_matrix(vectors)
+        added = _as_names(names)
+        if self._matrix is None:
+            return ExactIndex(added, vectors)
+        return ExactIndex(np.concatenate([self._names, added]), np.concatenate([self._matrix, vectors]))
+
+    def with_removed(self, names):
+        """
+        Return a copy without the given items
+
+        Args:
+            names (list): Item names to remove, unknown names are ignored
+
+        Returns:
+            ExactIndex: The new index
+        """
+        keep = ~np.isin(self._names, list(names))
+        if keep.all():
+            return self
+        return ExactIndex(self._names[keep], self._matrix[keep] if keep.any() else None)
+
+    def search(self, queries, k):
+        """
+        Find the k items with the highest inner product with each query
+
+        Args:
+            queries (np.ndarray): L2-normalized queries of shape [num_queries, dim]
+            k (int): Number of results per query
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Item names and scores of shape [num_queries, k],
+            best first, padded with None and -inf when fewer items are found
+        """
+        result_names, result_scores = _empty_results(len(queries), k)
+        if self._matrix is None:
+            return result_names, result_scores
+
+        columns, scores = top_k(_as_matrix(queries) @ self._matrix.T, k)
+        result_names[:, :columns.shape[1]] = self._names[columns]
+        result_scores[:, :columns.shape[1]] = scores
+        return result_names, result_scores
+
+
+class IVFIndex:
+    """
+    Inverted file index: vectors are grouped by nearest k-means centroid and a
+    query only scans the nprobe clusters closest to it
+
+    Insertions and deletions copy only the clusters they touch. The centroids are
+    retrained from scratch when the index has doubled since the last training.
+    """
+
+    def __init__(self, nlist=None, nprobe=8):
+        """
+        Args:
+            nlist (int): Number of clusters, about sqrt(num_vectors) when None
+            nprobe (int): Number of clusters scanned per query
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._centroids = None
+        self._lists = []
+        self._where = {}
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, name):
+        return name in self._where
+
+    @property
+    def is_trained(self):
+        """bool: False while the index is small enough to be scanned in full"""
+        return self._centroids is not None
+
+    def _copy(self):
+        index = IVFIndex(self.nlist, self.nprobe)
+        index._centroids = self._centroids
+        index._lists = list(self._lists)
+        index._where = dict(self._where)
+        index._trained_size = self._trained_size
+        return index
+
+    def _items(self):
+        """Return every name and vector currently stored"""
+        names = [names for names, _ in self._lists]
+        matrices = [matrix for _, matrix in self._lists]
+        if not names:
+            return np.empty(0, dtype=object), None
+        return np.concatenate(names), np.concatenate(matrices)
+
+    def _train(self, names, matrix):
+        """Cluster every vector and rebuild all the lists"""
+        nlist = self.nlist or max(1, round(math.sqrt(len(matrix))))
+        self._centroids = _spherical_kmeans(matrix, min(nlist, len(matrix)))
+        self._trained_size = len(matrix)
+        assignment = np.argmax(matrix @ self._centroids.T, axis=1)
+        self._lists = [(names[assignment == i], matrix[assignment == i]) for i in range(len(self._centroids))]
+        self._where = {name: i for i, name in zip(assignment.tolist(), names)}
+
+    def with_added(self, names, vectors):
+        """
+        Return a copy holding extra vectors
+
+        Args:
+            names (list): Item names, one per vector
+            vectors (np.ndarray): L2-normalized vectors of shape [num_items, dim]
+
+        Returns:
+            IVFIndex: The new index
+        """
+        vectors = _as_matrix(vectors)
+        added = _as_names(names)
+        index = self._copy()
+        size = len(index) + len(added)
+
+        if size >= IVF_MIN_TRAIN_SIZE and (not index.is_trained or size >= 2 * index._trained_size):
+            all_names, matrix = index._items()
+            if matrix is not None:
+                added, vectors = np.concatenate([all_names, added]), np.concatenate([matrix, vectors])
+            index._train(added, vectors)
+            return index
+
+        # Untrained indexes keep everything in one list that is scanned in full
+        assignment = (
+            np.argmax(vectors @ index._centroids.T, axis=1) if index.is_trained
+            else np.zeros(len(vectors), dtype=np.int64)
+        )
+        if not index._lists:
+            index._lists = [(np.empty(0, dtype=object), np.empty((0, vectors.shape[1]), dtype=np.float32))]
+        for i in np.unique(assignment).tolist():
+            list_names, list_matrix = index._lists[i]
+            mask = assignment == i
+            index._lists[i] = (np.concatenate([list_names, added[mask]]), np.concatenate([list_matrix, vectors[mask]]))
+        index._where.update(zip(added.tolist(), assignment.tolist()))
+        return index
+
+    def with_removed(self, names):
+        """
+        Return a copy without the given items
+
+        Args:
+            names (list): Item names to remove, unknown names are ignored
+
+        Returns:
+            IVFIndex: The new index
+        """
+        names = [name for name in names if name in self._where]
+        if not names:
+            return self
+
+        index = self._copy()
+        for i in {index._where.pop(name) for name in names}:
+            list_names, list_matrix = index._lists[i]
+            keep = ~np.isin(list_names, names)
+            index._lists[i] = (list_names[keep], list_matrix[keep])
+        return index
+
+    def search(self, queries, k):
+        """
+        Find approximately the k items with the highest inner product with each query
+
+        Args:
+            queries (np.ndarray): L2-normalized queries of shape [num_queries, dim]
+            k (int): Number of results per query
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Item names and scores of shape [num_queries, k],
+            best first, padded with None and -inf when fewer items are found
+        """
+        queries = _as_matrix(queries)
+        result_names, result_scores = _empty_results(len(queries), k)
+        if not self._where:
+            return result_names, result_scores
+
+        if self.is_trained:
+            nprobe = min(self.nprobe, len(self._lists))
+            probes, _ = top_k(queries @ self._centroids.T, nprobe)
+        else:
+            probes = np.zeros((len(queries), 1), dtype=np.int64)
+
+        for row, query in enumerate(queries):
+            lists = [self._lists[i] for i in probes[row].tolist() if len(self._lists[i][0])]
+            if not lists:
+                continue
+            names = np.concatenate([list_names for list_names, _ in lists])
+            scores = np.concatenate([list_matrix @ query for _, list_matrix in lists])
+            columns, best = top_k(scores[None], k)
+            result_names[row, :columns.shape[1]] = names[columns[0]]
+            result_scores[row, :columns.shape[1]] = best[0]
+        return result_names, result_scores
+
+
+class FaissIndex:
+    """
+    Adapter over a FAISS inner product index (flat, or IVF when nlist is set)
+
+    FAISS indexes are mutable, so updates clone the whole index to keep the
+    copy-on-write contract. Updates are O(num_vectors), searches are not.
+    Like IVFIndex, an IVF index stays flat until it holds IVF_MIN_TRAIN_SIZE
+    vectors and is retrained when it has doubled since the last training.
+    """
+
+    def __init__(self, nlist=None, nprobe=8):
+        """
+        Args:
+            nlist (int): Number of IVF clusters, a flat index is used when None
+            nprobe (int): Number of IVF clusters scanned per query
+        """
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("The 'faiss' index requires the faiss-cpu package (pip install faiss-cpu)") from e
+
+        self._faiss = faiss
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._index = None
+        self._ids = {}
+        self._names = {}
+        self._next_id = 0
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def _copy(self, clone=True):
+        index = FaissIndex.__new__(FaissIndex)
+        index.__dict__.update(self.__dict__)
+        if clone and self._index is not None:
+            index._index = self._faiss.clone_index(self._index)
+        index._ids = dict(self._ids)
+        index._names = dict(self._names)
+        return index
+
+    def _vectors(self):
+        """Return the ids and vectors currently stored, read back from the FAISS index"""
+        ids = np.fromiter(self._ids.values(), dtype=np.int64, count=len(self._ids))
+        if not len(ids):
+            return ids, None
+        return ids, np.stack([self._index.reconstruct(int(item_id)) for item_id in ids.tolist()])
+
+    def _train(self, vectors, ids):
+        """Create an IVF index whose quantizer is trained on every vector, and fill it"""
+        faiss = self._faiss
+        dim = vectors.shape[1]
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, min(self.nlist, len(vectors)), faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = self.nprobe
+        # The IVF index owns its quantizer from now on
+        index.own_fields = True
+        quantizer.this.disown()
+        # Lets vectors be removed, and read back by id for the next training
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        index.add_with_ids(vectors, ids)
+        return index
+
+    def with_added(self, names, vectors):
+        """
+        Return a copy holding extra vectors
+
+        Args:
+            names (list): Item names, one per vector
+            vectors (np.ndarray): L2-normalized vectors of shape [num_items, dim]
+
+        Returns:
+            FaissIndex: The new index
+        """
+        vectors = _as_matrix(vectors)
+        size = len(self) + len(vectors)
+        train = self.nlist is not None and size >= IVF_MIN_TRAIN_SIZE and (
+            not self._trained_size or size >= 2 * self._trained_size
+        )
+        # A trained index is built from scratch, the current one is only read
+        index = self._copy(clone=not train)
+
+        ids = np.arange(index._next_id, index._next_id + len(vectors), dtype=np.int64)
+        index._next_id += len(vectors)
+        if train:
+            all_ids, all_vectors = self._vectors()
+            if all_vectors is not None:
+                all_ids, all_vectors = np.concatenate([all_ids, ids]), np.concatenate([all_vectors, vectors])
+            else:
+                all_ids, all_vectors = ids, vectors
+            index._index = index._train(all_vectors, all_ids)
+            index._trained_size = size
+        else:
+            # Untrained indexes are flat and scanned in full
+            if index._index is None:
+                index._index = index._faiss.IndexIDMap2(index._faiss.IndexFlatIP(vectors.shape[1]))
+            index._index.add_with_ids(vectors, ids)
+        for name, item_id in zip(names, ids.tolist()):
+            index._ids[name] = item_id
+            index._names[item_id] = name
+        return index
+
+    def with_removed(self, names):
+        """
+        Return a copy without the given items
+
+        Args:
+            names (list): Item names to remove, unknown names are ignored
+
+        Returns:
+            FaissIndex: The new index
+        """
+        names = [name for name in names if name in self._ids]
+        if not names:
+            return self
+
+        index = self._copy()
+        ids = np.array([index._ids.pop(name) for name in names], dtype=np.int64)
+        for item_id in ids.tolist():
+            del index._names[item_id]
+        index._index.remove_ids(ids)
+        return index
+
+    def search(self, queries, k):
+        """
+        Find the k items with the highest inner product with each query
+
+        Args:
+            queries (np.ndarray): L2-normalized queries of shape [num_queries, dim]
+            k (int): Number of results per query
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Item names and scores of shape [num_queries, k],
+            best first, padded with None and -inf when fewer items are found
+        """
+        result_names, result_scores = _empty_results(len(queries), k)
+        if self._index is None or not self._ids:
+            return result_names, result_scores
+
+        scores, ids = self._index.search(_as_matrix(queries), k)
+        found = ids >= 0
+        result_names[found] = [self._names[item_id] for item_id in ids[found].tolist()]
+        result_scores[found] = scores[found]
+        return result_names, result_scores
+
+
+def _spherical_kmeans(matrix, nlist, iterations=10, seed=0):
+    """
+    Cluster L2-normalized vectors by cosine similarity
+
+    Args:
+        matrix (np.ndarray): Vectors of shape [num_vectors, dim]
+        nlist (int): Number of clusters
+        iterations (int): Number of assignment and update rounds
+        seed (int): Seed of the initial centroid sample
+
+    Returns:
+        np.ndarray: L2-normalized centroids of shape [nlist, dim]
+    """
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), nlist, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(matrix @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(matrix[order], starts[filled], axis=0)
+        # Empty clusters restart from a random vector
+        sums[~filled] = matrix[rng.choice(len(matrix), int((~filled).sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)